@@ -0,0 +1,305 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from .datasets import arrow_table, new_sidecar_name, widen_schema
+from .ingest import (NUMERIC_COLUMNS, SUMMARY_MAX_EQUIPMENT, StatsAccumulator, _analyzed_frames, _widen_sidecar,
+                     analyze_chunk, store_readings)
+from .metrics import stage
+from .models import EquipmentDataset, GroupTotals
+
+# --- Appending Rows ---
+# Equipment logs grow during the day, so new rows can be added to an existing
+# dataset instead of re-uploading the whole CSV:
+#   POST /api/history/<pk>/append/  file=<CSV holding only the new rows>
+# Only the new rows are parsed and classified. They go to the stored CSV, to
+# a new sidecar segment and to the readings table, and the dataset's running
+# totals (stats_state) are folded forward, so an append costs O(new rows).
+# The first append of a dataset builds those totals from its sidecar once.
+# Group columns with more keys than stats_state keeps (STATE_MAX_GROUPS) have
+# their per-key sums in the GroupTotals table instead, where an append only
+# touches the keys of its own rows.
+# Segments are merged like a binary counter: whenever the newest files
+# together outgrow the file before them, they are rewritten as one. Each row
+# is rewritten O(log appends) times, and a dataset keeps O(log appends) files.
+
+# Group column, summary section and limit of the means kept in GroupTotals
+TOTALS_SECTIONS = (
+    ('Type', 'by_type', None),
+    ('Equipment Name', 'by_equipment', SUMMARY_MAX_EQUIPMENT),
+)
+
+
+class AppendError(ValueError):
+    pass
+
+
+def csv_columns(dataset):
+    """Header of the dataset's stored CSV."""
+    file_path = os.path.join(settings.MEDIA_ROOT, dataset.file_name)
+    return list(pd.read_csv(file_path, nrows=0).columns)
+
+
+def read_rows(file_obj, columns):
+    """Parse and classify the rows to append. Returns (raw, analyzed) frames.
+
+    ``raw`` keeps the CSV text as parsed, in the dataset's column order, and
+    is what gets appended to the stored CSV.
+    """
+    df = pd.read_csv(file_obj)
+    if set(df.columns) != set(columns):
+        raise AppendError(f"Columns must match the dataset: {', '.join(columns)}")
+    if df.empty:
+        raise AppendError('No rows to append')
+    raw = df[columns]
+    return raw, analyze_chunk(raw.copy())
+
+
+def _resume_stats(dataset):
+    if dataset.stats_state:
+        return StatsAccumulator.from_state(dataset.stats_state)
+    stats = StatsAccumulator()
+    for df in _analyzed_frames(dataset):
+        stats.update(df)
+    return stats
+
+
+def _sidecar_schema(dataset, names=None):
+    schemas = []
+    for name in names or [dataset.analyzed_file, *dataset.appended_files]:
+        with pa.memory_map(os.path.join(settings.MEDIA_ROOT, name)) as source:
+            schemas.append(pa.ipc.open_file(source).schema)
+    return pa.unify_schemas(schemas, promote_options='permissive')
+
+
+def _write_segment(dataset, analyzed):
+    """Write ``analyzed`` as a sidecar segment.
+
+    The sidecar's schema is used when the rows fit it. Otherwise (say,
+    fractional readings after an all-integer upload) the segment keeps its
+    own types if they promote to a common schema on read. A column that
+    changes type altogether (numeric tags, then text) is widened as during
+    ingest, rewriting the files that still have the old type. Returns the
+    segment name, or None when even that fails.
+    """
+    schema = _sidecar_schema(dataset)
+    try:
+        table = pa.Table.from_pandas(analyzed, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError, TypeError):
+        try:
+            table = arrow_table(analyzed)
+            try:
+                pa.unify_schemas([schema, table.schema], promote_options='permissive')
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                wider = widen_schema(schema, table.schema)
+                _widen_files(dataset, wider)
+                table = table.select(wider.names).cast(wider)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError, TypeError):
+            return None
+    name = new_sidecar_name(dataset.file_name)
+    with pa.ipc.new_file(os.path.join(settings.MEDIA_ROOT, name), table.schema) as writer:
+        writer.write_table(table)
+    return name
+
+
+def _widen_files(dataset, schema):
+    """Rewrite the sidecar files not already cast to ``schema``, updating the
+    dataset's file names. The replaced files are removed on commit."""
+    names, replaced = [], []
+    for name in [dataset.analyzed_file, *dataset.appended_files]:
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        with pa.memory_map(path) as source:
+            current = pa.ipc.open_file(source).schema
+        if current.equals(schema):
+            names.append(name)
+            continue
+        writer, widened = _widen_sidecar(path, schema, dataset.file_name, remove_source=False)
+        writer.close()
+        names.append(widened)
+        replaced.append(name)
+    dataset.analyzed_file = names[0]
+    dataset.appended_files = names[1:]
+    _delete_on_commit(replaced)
+
+
+def _merge_tail(dataset):
+    """Merge the newest sidecar files while together they outgrow the file
+    before them. Returns the replaced file names (empty if none)."""
+    names = [dataset.analyzed_file, *dataset.appended_files]
+    sizes = [os.path.getsize(os.path.join(settings.MEDIA_ROOT, name)) for name in names]
+    start, tail = len(names) - 1, sizes[-1]
+    while start > 0 and tail >= sizes[start - 1]:
+        start -= 1
+        tail += sizes[start]
+    if start == len(names) - 1:
+        return []
+
+    parts = names[start:]
+    schema = _sidecar_schema(dataset, parts)
+    merged = new_sidecar_name(dataset.file_name)
+    with pa.ipc.new_file(os.path.join(settings.MEDIA_ROOT, merged), schema) as writer:
+        for part in parts:
+            with pa.memory_map(os.path.join(settings.MEDIA_ROOT, part)) as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    table = pa.Table.from_batches([reader.get_batch(i)])
+                    writer.write_table(table.select(schema.names).cast(schema))
+    names[start:] = [merged]
+    dataset.analyzed_file = names[0]
+    dataset.appended_files = names[1:]
+    return parts
+
+
+def _delete_on_commit(names):
+    # Only once the dataset row stops pointing at them: a rollback keeps them
+    def delete():
+        for name in names:
+            default_storage.delete(name)
+    transaction.on_commit(delete)
+
+
+def _append_csv(dataset, raw):
+    """Append ``raw`` to the stored CSV and record its new size in csv_size.
+
+    Bytes past the committed csv_size (from an append whose transaction then
+    failed) are cut off first, so a retried append doesn't store rows twice.
+    """
+    file_path = os.path.join(settings.MEDIA_ROOT, dataset.file_name)
+    with open(file_path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        if dataset.csv_size is not None and dataset.csv_size < end:
+            end = dataset.csv_size
+            f.truncate(end)
+            f.seek(end)
+        if end:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+        f.write(raw.to_csv(header=False, index=False).encode('utf-8'))
+        dataset.csv_size = f.tell()
+
+
+def _upsert_totals_sql():
+    opts = GroupTotals._meta
+    quote = connection.ops.quote_name
+    keys = ('dataset_id', 'group_column', 'group_key')
+    sums = ('rows', 'pressure_sum', 'pressure_n', 'temperature_sum', 'temperature_n')
+    return 'INSERT INTO {table} ({columns}) VALUES ({values}) ON CONFLICT ({keys}) DO UPDATE SET {sums}'.format(
+        table=quote(opts.db_table),
+        columns=', '.join(quote(column) for column in keys + sums),
+        values=', '.join(['%s'] * (len(keys) + len(sums))),
+        keys=', '.join(quote(column) for column in keys),
+        sums=', '.join(f'{quote(column)} = {quote(opts.db_table)}.{quote(column)} + excluded.{quote(column)}'
+                       for column in sums),
+    )
+
+
+def _add_group_totals(dataset, column, sums):
+    """Add the per-key ``sums`` (see StatsAccumulator.group_sums) to GroupTotals."""
+    max_length = GroupTotals._meta.get_field('group_key').max_length
+    missing = pd.Series(0, index=sums.index)
+    parts = [sums['rows']]
+    for col in NUMERIC_COLUMNS:
+        parts += [sums.get(f'{col} sum', missing), sums.get(f'{col} n', missing)]
+    rows = [(dataset.pk, column, str(key)[:max_length], *map(_number, values))
+            for key, *values in zip(sums.index, *parts)]
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_totals_sql(), rows)
+
+
+def _number(value):
+    return float(value) if isinstance(value, float) else int(value)
+
+
+def _update_group_totals(dataset, stats, state, analyzed):
+    """Fold ``analyzed`` into GroupTotals for the group columns that ``state``
+    leaves out, moving a column's sums there the first time it is left out.
+    Returns those group columns."""
+    kept = [column for column, groups in state['groups'].items() if groups is None]
+    new_rows = None
+    for column in kept:
+        if column in stats.dropped:
+            if new_rows is None:
+                new_rows = StatsAccumulator()
+                new_rows.update(analyzed)
+            sums = new_rows.group_sums(column)
+        else:
+            sums = stats.group_sums(column)
+        if sums is not None:
+            _add_group_totals(dataset, column, sums)
+    return kept
+
+
+def _group_means_from_totals(dataset, column, limit):
+    totals = GroupTotals.objects.filter(dataset=dataset, group_column=column).order_by('-rows', 'id')
+    if limit:
+        totals = totals[:limit]
+    return {
+        row.group_key: {
+            "count": row.rows,
+            "avg_pressure": round(row.pressure_sum / row.pressure_n, 2) if row.pressure_n else None,
+            "avg_temp": round(row.temperature_sum / row.temperature_n, 2) if row.temperature_n else None,
+        }
+        for row in totals
+    }
+
+
+def append_rows(dataset_id, raw, analyzed):
+    """Append parsed rows to a dataset and fold them into its summary_stats.
+
+    Runs in one transaction holding the dataset row lock (SELECT ... FOR
+    UPDATE; on SQLite, the write lock its IMMEDIATE transactions take), so
+    concurrent appends to a dataset apply one after the other. An append that
+    waits on the lock longer than the database timeout fails with
+    OperationalError and commits nothing. Returns the dataset.
+    """
+    with transaction.atomic():
+        with stage('orm'):
+            dataset = EquipmentDataset.objects.select_for_update().get(pk=dataset_id)
+
+        with stage('stats'):
+            stats = _resume_stats(dataset)
+            stats.update(analyzed)
+
+        if dataset.analyzed_file:
+            with stage('sidecar'):
+                segment = _write_segment(dataset, analyzed)
+            if segment:
+                dataset.appended_files = [*dataset.appended_files, segment]
+                with stage('sidecar'):
+                    _delete_on_commit(_merge_tail(dataset))
+            else:
+                # Last resort, as during ingest: history falls back to the CSV
+                _delete_on_commit([dataset.analyzed_file, *dataset.appended_files])
+                dataset.analyzed_file = ''
+                dataset.appended_files = []
+
+        if not dataset.readings_pending:
+            with stage('readings'):
+                store_readings(dataset, [analyzed])
+        # else fill_readings stores these rows along with the upload's
+
+        with stage('stats'):
+            state = stats.state()
+            kept = _update_group_totals(dataset, stats, state, analyzed)
+            summary = stats.result()
+            for column, section, limit in TOTALS_SECTIONS:
+                if column in kept:
+                    summary[section] = _group_means_from_totals(dataset, column, limit)
+
+        dataset.summary_stats = summary
+        dataset.stats_state = state
+        dataset.total_records = stats.count
+        # The stored CSV no longer matches the uploaded one
+        dataset.content_hash = ''
+        with stage('save'):
+            _append_csv(dataset, raw)
+        with stage('orm'):
+            # Not readings_stored: a background fill may be advancing it
+            dataset.save(update_fields=['summary_stats', 'stats_state', 'total_records', 'content_hash',
+                                        'analyzed_file', 'appended_files', 'csv_size', 'updated_at'])
+    return dataset
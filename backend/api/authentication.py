@@ -0,0 +1,54 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# --- Cached Token Authentication ---
+# DRF's TokenAuthentication joins token and user on every request, history
+# polls included. This subclass keeps the resolved Token (with its user) in
+# the AUTH_TOKEN_CACHE cache for AUTH_TOKEN_CACHE_TTL seconds. Entries are
+# dropped as soon as a token is deleted (logout, rotation) or its user is
+# saved (password change, deactivation) in the same process; the TTL bounds
+# changes made without going through the ORM, and in other processes while
+# the cache is per process (see settings). Keys are hashed so raw tokens
+# never reach the cache backend.
+
+
+def _cache():
+    return caches[settings.AUTH_TOKEN_CACHE]
+
+
+def cache_key(key):
+    return 'auth-token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def invalidate(key):
+    _cache().delete(cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache = _cache()
+        token = cache.get(cache_key(key))
+        if token is None:
+            # Unknown or inactive: raises AuthenticationFailed, nothing is cached
+            _, token = super().authenticate_credentials(key)
+            cache.set(cache_key(key), token, settings.AUTH_TOKEN_CACHE_TTL)
+        return token.user, token
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            invalidate(key)
@@ -0,0 +1,167 @@
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .ingest import find_duplicate, save_upload
+from .metrics import stage
+from .models import EquipmentDataset
+
+# --- Batch Uploads ---
+# End-of-shift uploads arrive as many per-unit CSVs, either as repeated
+# ``files`` form fields or packed in ZIP archives. Every CSV is saved and
+# hashed like a single upload, the new ones are analyzed concurrently on the
+# analysis pool (see api.concurrency), and all resulting datasets are created
+# in one statement. A file that fails to parse is reported next to the
+# others instead of failing the batch. A batch may create more datasets than
+# DATASET_RETENTION keeps; compaction then prunes the oldest of them like any
+# other upload, and the response warns about it.
+#   POST /api/upload/batch/  files=<a.csv> files=<b.csv> files=<shift.zip>
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _is_zip(upload):
+    return os.path.splitext(upload.name)[1].lower() == '.zip'
+
+
+def _zip_members(archive):
+    """CSV members of ``archive``, skipping folders and macOS/hidden metadata."""
+    members = []
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name.lower().endswith('.csv'):
+            continue
+        if name.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        members.append((info, name))
+    return members
+
+
+def _save(name, file_obj):
+    file_name, content_hash = save_upload(file_obj)
+    return {'file': name, 'file_name': file_name, 'content_hash': content_hash}
+
+
+def save_batch(uploads):
+    """Save every CSV in ``uploads`` (expanding ZIP archives) to MEDIA_ROOT.
+
+    Returns one entry per CSV, in upload order: ``{'file', 'file_name',
+    'content_hash'}``, or ``{'file', 'error'}`` for an unreadable archive.
+    Raises BatchError when the batch exceeds BATCH_MAX_FILES or
+    BATCH_MAX_BYTES; nothing is left on disk in that case.
+    """
+    entries = []
+    total_bytes = 0
+    try:
+        for upload in uploads:
+            if not _is_zip(upload):
+                total_bytes += upload.size or 0
+                _check_limits(len(entries) + 1, total_bytes)
+                entries.append(_save(upload.name, upload))
+                continue
+
+            try:
+                archive = zipfile.ZipFile(upload)
+            except zipfile.BadZipFile:
+                entries.append({'file': upload.name, 'error': 'Invalid ZIP archive'})
+                continue
+            with archive:
+                members = _zip_members(archive)
+                # Check declared sizes before inflating anything
+                total_bytes += sum(info.file_size for info, _ in members)
+                _check_limits(len(entries) + len(members), total_bytes)
+                for info, name in members:
+                    label = f'{upload.name}/{info.filename}'
+                    try:
+                        with archive.open(info) as member:
+                            entries.append(_save(label, File(member, name=name)))
+                    except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+                        entries.append({'file': label, 'error': f'Invalid ZIP member: {e}'})
+    except BatchError:
+        discard(entries)
+        raise
+    return entries
+
+
+def _check_limits(files, total_bytes):
+    if files > settings.BATCH_MAX_FILES:
+        raise BatchError(f'A batch may contain at most {settings.BATCH_MAX_FILES} CSV files')
+    if total_bytes > settings.BATCH_MAX_BYTES:
+        raise BatchError(f'A batch may contain at most {settings.BATCH_MAX_BYTES} bytes of CSV')
+
+
+def discard(entries):
+    """Remove the saved CSVs (and sidecars) of entries that won't be recorded."""
+    for entry in entries:
+        if entry.get('file_name'):
+            default_storage.delete(entry['file_name'])
+        if entry.get('analyzed_file'):
+            default_storage.delete(entry['analyzed_file'])
+
+
+def match_duplicates(user, entries):
+    """Point entries the user already uploaded, or that repeat an earlier
+    entry of the batch, at that dataset (or entry) and drop the new copy."""
+    first = {}
+    for entry in entries:
+        duplicate = find_duplicate(user, entry['content_hash'])
+        if duplicate:
+            entry['dataset'] = duplicate
+        elif entry['content_hash'] in first:
+            entry['same_as'] = first[entry['content_hash']]
+        else:
+            first[entry['content_hash']] = entry
+            continue
+        default_storage.delete(entry.pop('file_name'))
+        entry['deduplicated'] = True
+
+
+def retention_warning(datasets):
+    """Warning for the batch response when the recorded ``datasets`` outnumber
+    DATASET_RETENTION, or None."""
+    keep = settings.DATASET_RETENTION
+    if keep and len(datasets) > keep:
+        return (f'{len(datasets)} datasets were created but only the newest {keep} are kept; '
+                f'the others will be pruned by the next compaction')
+    return None
+
+
+def record_batch(user, entries):
+    """Create the datasets of analyzed ``entries`` in one INSERT; their
+    readings are filled afterwards (see api.jobs.schedule_readings).
+
+    Each entry carries ``file_name``, ``content_hash``, ``stats`` and
+    ``analyzed_file``. Returns the datasets in the same order.
+    """
+    with stage('orm'):
+        return EquipmentDataset.objects.bulk_create([
+            EquipmentDataset(
+                user=user,
+                file_name=entry['file_name'],
+                analyzed_file=entry['analyzed_file'],
+                content_hash=entry['content_hash'],
+                total_records=entry['stats']['total_count'],
+                summary_stats=entry['stats'],
+                readings_pending=True,
+            )
+            for entry in entries
+        ])
+
+
+def batch_result(entry):
+    """Per-file part of the batch response."""
+    source = entry.get('same_as', entry)
+    if 'error' in source:
+        return {'file': entry['file'], 'error': source['error']}
+    dataset = source['dataset']
+    return {
+        'file': entry['file'],
+        'history_id': dataset.id,
+        'stats': dataset.summary_stats,
+        'deduplicated': entry.get('deduplicated', False),
+    }
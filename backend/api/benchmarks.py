@@ -0,0 +1,151 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .authentication import CachedTokenAuthentication
+from .health import classify
+from .ingest import StatsAccumulator, analyze_chunk, chunk_rows
+from .models import EquipmentDataset, EquipmentReading
+from .renderers import arrow_bytes
+from .synthetic import synthetic_frame, write_csv
+from .views import EquipmentUploadView
+
+# --- Benchmark Suite ---
+# Times the main data paths on synthetic CSVs. In-process stages call the
+# library code directly, while the upload and history stages go through the
+# Django test client, so they include middleware, auth, parsing and rendering.
+# Each stage runs once untraced for timing, then once under tracemalloc for
+# peak memory. tracemalloc sees Python and NumPy allocations but not Arrow's
+# own memory pool. ``auth_benchmark`` counts queries per history poll with
+# and without the token cache.
+
+BENCHMARK_USER = 'benchmark'
+
+
+@contextmanager
+def benchmark_database():
+    """A throwaway test database, so benchmarks never write to the real one."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(fn, memory=True):
+    """Return ``(seconds, peak_bytes)`` for ``fn()``; peak_bytes is None untraced."""
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    if not memory:
+        return seconds, None
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def _stats(df):
+    stats = StatsAccumulator()
+    step = chunk_rows()
+    for start in range(0, len(df.index), step):
+        stats.update(df.iloc[start:start + step])
+    return stats.result()
+
+
+def run_benchmarks(rows, memory=True, **options):
+    """Yield one result dict per stage for a synthetic dataset of ``rows`` rows.
+
+    Needs a database to write to; the `benchmark` command provides a
+    throwaway test database.
+    """
+    df = synthetic_frame(rows, **options)
+    analyzed = analyze_chunk(df.copy())
+    stages = [
+        ('classify', lambda: classify(df)),
+        ('stats', lambda: _stats(analyzed)),
+        ('serialize_json', lambda: JSONRenderer().render({'data': analyzed.fillna('').to_dict(orient='records')})),
+        ('serialize_arrow', lambda: arrow_bytes({}, analyzed)),
+    ]
+
+    with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root, UPLOAD_JOB_WORKERS=0, MEDIA_COMPACT_INTERVAL=0):
+        user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+        client = APIClient()
+        client.force_authenticate(user)
+        csv_path = os.path.join(media_root, 'benchmark-source.csv')
+        size = write_csv(csv_path, rows, **options)
+
+        def upload():
+            # Start from scratch each time so deduplication never short-circuits
+            EquipmentReading.objects.filter(dataset__user=user).delete()
+            EquipmentDataset.objects.filter(user=user).delete()
+            with open(csv_path, 'rb') as f:
+                res = client.post('/api/upload/?limit=100', {'file': f}, format='multipart')
+            assert res.status_code == 200, res.status_code
+
+        def history(accept):
+            def get():
+                dataset = EquipmentDataset.objects.filter(user=user).latest('uploaded_at')
+                res = client.get(f'/api/history/{dataset.pk}/', HTTP_ACCEPT=accept)
+                assert res.status_code == 200, res.status_code
+                b''.join(res)
+            return get
+
+        stages += [
+            ('upload', upload),
+            ('history_json', history('application/json')),
+            ('history_arrow', history('application/vnd.apache.arrow.stream')),
+        ]
+        for name, fn in stages:
+            seconds, peak = measure(fn, memory)
+            yield {
+                'rows': rows,
+                'stage': name,
+                'seconds': seconds,
+                'rows_per_sec': rows / seconds if seconds else float('inf'),
+                'peak_mb': None if peak is None else peak / 2 ** 20,
+                'csv_mb': size / 2 ** 20,
+            }
+
+
+def auth_benchmark(requests=200):
+    """Queries and seconds per authenticated history poll, per authentication class."""
+    user, _ = User.objects.get_or_create(username=BENCHMARK_USER)
+    token, _ = Token.objects.get_or_create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+        caches[settings.AUTH_TOKEN_CACHE].clear()
+        with mock.patch.object(EquipmentUploadView, 'authentication_classes', [auth_class]):
+            assert client.get('/api/upload/').status_code == 200 # warm up
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(requests):
+                    client.get('/api/upload/')
+                seconds = time.perf_counter() - start
+        yield {
+            'auth': auth_class.__name__,
+            'queries_per_request': len(queries) / requests,
+            'ms_per_request': seconds * 1000 / requests,
+        }
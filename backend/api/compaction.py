@@ -0,0 +1,90 @@
+import os
+import time
+
+from django.conf import settings
+
+from .history import expired_datasets
+from .models import EquipmentDataset, EquipmentReading, GroupTotals, UploadJob
+
+# --- Media Compaction ---
+# Retention is applied here, away from the request path: the expired datasets
+# and their readings are deleted by id, and the CSVs and Arrow sidecars they
+# pointed to are reclaimed in one pass over MEDIA_ROOT. Run
+# `manage.py compact_media` from cron, or let the upload job pool do it every
+# MEDIA_COMPACT_INTERVAL seconds (see api.jobs).
+
+# Dataset ids per DELETE, well under SQLite's bound-parameter limit
+PRUNE_BATCH = 500
+
+
+def referenced_files(exclude=()):
+    """Media file names still needed by a dataset (other than the ids in
+    ``exclude``) or an unfinished upload job."""
+    exclude = set(exclude)
+    names = set()
+    datasets = EquipmentDataset.objects.values_list('id', 'file_name', 'analyzed_file', 'appended_files')
+    for pk, file_name, analyzed_file, appended_files in datasets.iterator():
+        if pk in exclude:
+            continue
+        names.add(file_name)
+        if analyzed_file:
+            names.add(analyzed_file)
+        names.update(appended_files)
+    pending = UploadJob.objects.filter(status__in=(UploadJob.PENDING, UploadJob.RUNNING))
+    names.update(pending.values_list('file_name', flat=True))
+    return names
+
+
+def prune_datasets(ids, dry_run=False):
+    """Delete the datasets ``ids`` with their readings and group totals, or
+    only count them on a ``dry_run``. Returns (datasets, readings)."""
+    datasets = readings = 0
+    for start in range(0, len(ids), PRUNE_BATCH):
+        batch = ids[start:start + PRUNE_BATCH]
+        dataset_rows = EquipmentDataset.objects.filter(id__in=batch)
+        reading_rows = EquipmentReading.objects.filter(dataset_id__in=batch)
+        if dry_run:
+            datasets += dataset_rows.count()
+            readings += reading_rows.count()
+        else:
+            datasets += dataset_rows.delete()[0]
+            readings += reading_rows.delete()[0]
+            GroupTotals.objects.filter(dataset_id__in=batch).delete()
+    return datasets, readings
+
+
+def compact(dry_run=False, grace=None):
+    """Apply retention to every user, deleting the expired datasets with
+    their readings, then delete unreferenced media files.
+
+    Files modified within ``grace`` seconds (MEDIA_COMPACT_GRACE by default)
+    are kept: they may belong to an upload that is still being ingested.
+    Returns a dict with the datasets and readings pruned and the files and
+    bytes reclaimed.
+    """
+    grace = settings.MEDIA_COMPACT_GRACE if grace is None else grace
+    expired = list(expired_datasets().values_list('id', flat=True))
+    datasets, readings = prune_datasets(expired, dry_run)
+    # A dry run leaves the expired rows in place, so discount them by hand
+    keep = referenced_files(exclude=expired if dry_run else ())
+    cutoff = time.time() - grace
+
+    files = reclaimed = 0
+    try:
+        entries = list(os.scandir(settings.MEDIA_ROOT))
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        if entry.name in keep or entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+            continue
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime > cutoff:
+            continue
+        if not dry_run:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+        files += 1
+        reclaimed += stat.st_size
+    return {'datasets': datasets, 'readings': readings, 'files': files, 'bytes': reclaimed}
@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from rest_framework.views import APIView
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+# --- Async Views ---
+# Under ASGI the upload and history views are coroutines, so a request that is
+# waiting on pandas or pyarrow doesn't hold the event loop. Each blocking step
+# is delegated:
+#   * ORM queries and auth: ``sync_to_async`` (Django's thread-sensitive
+#     executor, so connections stay per request);
+#   * file I/O: ``run_io`` (asgiref's unbounded I/O threads);
+#   * CSV parsing, analysis and serialization: ``run_cpu``, a pool bounded
+#     by ANALYSIS_WORKERS, so a burst of uploads queues instead of
+#     oversubscribing the CPU.
+# Under WSGI the same views run through async_to_sync and behave as before.
+# Every middleware in settings.MIDDLEWARE must be async-capable for this to
+# pay off under ASGI (see StaticFilesMiddleware).
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.ANALYSIS_WORKERS,
+                thread_name_prefix='analysis',
+            )
+        return _pool
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` on the bounded analysis pool.
+
+    Runs inline when ANALYSIS_WORKERS is 0. The caller's context (e.g. the
+    request's metrics stages) is carried into the worker thread.
+    """
+    call = functools.partial(func, *args, **kwargs)
+    if not settings.ANALYSIS_WORKERS:
+        return call()
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_get_pool(), context.run, call)
+
+
+async def run_io(func, *args, **kwargs):
+    """Await blocking file I/O that doesn't touch the database."""
+    return await sync_to_async(func, thread_sensitive=False)(*args, **kwargs)
+
+
+class AsyncAPIView(APIView):
+    """APIView whose handlers are ``async def``.
+
+    DRF dispatch is synchronous, so authentication, permission and throttle
+    checks (which may hit the database) run through ``sync_to_async``; the
+    handler itself is awaited on the event loop.
+    """
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that also runs natively under ASGI.
+
+    WhiteNoise is sync-only, and one sync-only middleware makes Django run
+    everything below it (including the async views) through a thread per
+    request. Static lookups here are dictionary hits; only serving a file is
+    pushed off the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await run_io(self.find_file, request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await run_io(self.serve, static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,57 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+# --- Conditional GET ---
+# A dataset only changes when rows are appended, which bumps updated_at, so its
+# representation is fully determined by the dataset identity and version plus
+# the query string and media type.
+# Clients revalidate with If-None-Match and get an empty 304 when unchanged.
+
+
+def _digest(*parts):
+    return quote_etag(hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:32])
+
+
+def dataset_etag(dataset, request):
+    query = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+    return _digest(
+        str(dataset.pk),
+        dataset.content_hash or dataset.file_name,
+        dataset.updated_at.isoformat(),
+        request.accepted_media_type or '',
+        json.dumps(query),
+    )
+
+
+def content_etag(payload, request):
+    """ETag for a small JSON-able payload such as the history list."""
+    return _digest(
+        request.accepted_media_type or '',
+        json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True),
+    )
+
+
+def add_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Responses are per-user: never shared, always revalidated
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Accept', 'Authorization'))
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 (or 412) when the request's preconditions say so, else None."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if response is not None:
+        add_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,176 @@
+import os
+
+import pyarrow as pa
+import pyarrow.feather as feather
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+# --- Analyzed Dataset Sidecars ---
+# The analyzed frame (typed columns plus Status) is written once on upload as an
+# uncompressed Arrow IPC file next to the CSV. Uncompressed keeps it
+# memory-mappable, so loads only touch the pages of the columns requested.
+# Rows appended later get segment files of their own instead of a rewrite.
+
+SIDECAR_EXT = '.arrow'
+
+# Records converted to Python objects at a time when streaming a dataset
+STREAM_BATCH_ROWS = 5_000
+
+
+def new_sidecar_name(file_name):
+    """Reserve a free sidecar name next to the uploaded CSV ``file_name``."""
+    base, _ = os.path.splitext(file_name)
+    return default_storage.get_available_name(base + SIDECAR_EXT)
+
+
+def arrow_table(df):
+    """``df`` as an Arrow table.
+
+    Object columns mixing numbers and text (pandas' chunked type inference
+    leaves these in large CSVs) are converted as strings.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed = {col: df[col].where(df[col].isna(), df[col].astype(str))
+                 for col in df.columns[df.dtypes == object]}
+        return pa.Table.from_pandas(df.assign(**mixed), preserve_index=False)
+
+
+def widen_schema(schema, other):
+    """A schema that both ``schema`` and ``other`` (same columns) cast to.
+
+    Types promote where Arrow allows it (null to anything, int64 to double);
+    any other disagreement makes the column a string column.
+    """
+    fields = []
+    for field in schema:
+        theirs = other.field(field.name)
+        try:
+            merged = pa.unify_schemas([pa.schema([field]), pa.schema([theirs])],
+                                      promote_options='permissive').field(0)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            merged = pa.field(field.name, pa.string())
+        fields.append(merged)
+    return pa.schema(fields)
+
+
+def _read_table(dataset, columns=None):
+    if not dataset.analyzed_file:
+        raise FileNotFoundError(f'Dataset {dataset.pk} has no analyzed sidecar')
+    tables = [
+        feather.read_table(os.path.join(settings.MEDIA_ROOT, name), columns=columns, memory_map=True)
+        for name in [dataset.analyzed_file, *dataset.appended_files]
+    ]
+    if len(tables) == 1:
+        return tables[0]
+    # Appended segments may widen a column's type, e.g. int64 to double (see api.append)
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+def analyzed_table(dataset, columns=None):
+    """The sidecar as a memory-mapped Arrow table."""
+    return _read_table(dataset, columns)
+
+
+def load_analyzed(dataset, columns=None):
+    """Memory-map a dataset's sidecar, reading only ``columns`` if given."""
+    return _read_table(dataset, columns).to_pandas()
+
+
+def load_present(dataset, columns):
+    """Like ``load_analyzed``, but skip any of ``columns`` the sidecar lacks."""
+    table = _read_table(dataset)
+    return table.select([c for c in columns if c in table.column_names]).to_pandas()
+
+
+# --- Paging & Projection ---
+# Query params shared by the upload and history detail endpoints:
+#   ?offset=0&limit=100&columns=Equipment Name,Status&sort=-Pressure
+# Without ``limit`` every remaining row is returned, as before.
+
+class PageError(ValueError):
+    """Malformed paging/projection query params (reported as HTTP 400)."""
+
+
+def parse_page(params):
+    try:
+        offset = int(params.get('offset') or 0)
+        limit = params.get('limit')
+        limit = int(limit) if limit not in (None, '') else None
+    except ValueError:
+        raise PageError('offset and limit must be integers')
+    if offset < 0 or (limit is not None and limit < 0):
+        raise PageError('offset and limit must not be negative')
+
+    columns = [c.strip() for c in params.get('columns', '').split(',') if c.strip()] or None
+    sort = params.get('sort') or None
+    return {'offset': offset, 'limit': limit, 'columns': columns, 'sort': sort}
+
+
+def _sort_key(page):
+    sort = page['sort']
+    if not sort:
+        return None, False
+    return sort.lstrip('-'), sort.startswith('-')
+
+
+def check_columns(page, available):
+    key, _ = _sort_key(page)
+    wanted = (page['columns'] or []) + ([key] if key else [])
+    unknown = [c for c in wanted if c not in available]
+    if unknown:
+        raise PageError(f"Unknown column(s): {', '.join(unknown)}")
+
+
+def page_frame(df, page):
+    """Sort, slice and project an in-memory frame. Returns (page_df, total)."""
+    check_columns(page, df.columns)
+    total = len(df.index)
+    key, descending = _sort_key(page)
+    if key:
+        df = df.sort_values(key, ascending=not descending, kind='stable', na_position='last')
+    offset, limit = page['offset'], page['limit']
+    df = df.iloc[offset:None if limit is None else offset + limit]
+    if page['columns']:
+        df = df[page['columns']]
+    return df, total
+
+
+def analyzed_page_table(dataset, page):
+    """Sort, project and slice a sidecar in Arrow. Returns (table, total)."""
+    table = _read_table(dataset)
+    check_columns(page, table.column_names)
+    total = table.num_rows
+    key, descending = _sort_key(page)
+    if key:
+        table = table.sort_by([(key, 'descending' if descending else 'ascending')])
+    if page['columns']:
+        table = table.select(page['columns'])
+    return table.slice(page['offset'], page['limit']), total
+
+
+def iter_frames(rows, batch_rows=STREAM_BATCH_ROWS):
+    """Yield an Arrow table or DataFrame as DataFrames of at most ``batch_rows``."""
+    if isinstance(rows, pa.Table):
+        for batch in rows.to_batches(max_chunksize=batch_rows):
+            yield batch.to_pandas()
+        return
+    for start in range(0, len(rows.index), batch_rows):
+        yield rows.iloc[start:start + batch_rows]
+
+
+def to_records(rows):
+    df = rows.to_pandas() if isinstance(rows, pa.Table) else rows
+    return df.fillna('').to_dict(orient='records')
+
+
+def page_info(page, total, rows):
+    columns = rows.column_names if isinstance(rows, pa.Table) else list(rows.columns)
+    return {
+        'offset': page['offset'],
+        'limit': page['limit'],
+        'total': total,
+        'returned': len(rows),
+        'columns': columns,
+    }
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+# --- Health Rules ---
+# Statuses are assigned to whole columns at once with boolean masks instead of
+# a per-row Python function, so classification cost stays in NumPy.
+
+CRITICAL = 'CRITICAL'
+WARNING = 'WARNING'
+OK = 'OK'
+UNKNOWN = 'UNKNOWN'
+
+DEFAULT_THRESHOLDS = {
+    'critical_pressure': 800,
+    'critical_temp': 300,
+    'warning_pressure': 600,
+}
+
+
+def get_thresholds():
+    """Merge EQUIPMENT_HEALTH_THRESHOLDS from settings over the defaults.
+
+    The setting maps an equipment ``Type`` (or ``'default'``) to a partial
+    dict of thresholds, e.g. ``{'Reactor': {'critical_temp': 350}}``.
+    """
+    configured = getattr(settings, 'EQUIPMENT_HEALTH_THRESHOLDS', {}) or {}
+    default = {**DEFAULT_THRESHOLDS, **configured.get('default', {})}
+    per_type = {
+        equipment_type: {**default, **overrides}
+        for equipment_type, overrides in configured.items()
+        if equipment_type != 'default'
+    }
+    return default, per_type
+
+
+def _threshold_column(types, key, default, per_type):
+    """Broadcast one threshold to every row, honoring per-Type overrides."""
+    if types is None or not per_type:
+        return default[key]
+    mapped = types.map({t: values[key] for t, values in per_type.items()})
+    return mapped.fillna(default[key]).to_numpy(dtype=float)
+
+
+def classify(df, thresholds=None):
+    """Return a Series of health statuses aligned with ``df``'s index.
+
+    Rows whose Pressure or Temperature is missing or non-numeric are UNKNOWN,
+    as is every row when either column is absent.
+    """
+    if 'Pressure' not in df.columns or 'Temperature' not in df.columns:
+        return pd.Series(UNKNOWN, index=df.index, dtype=object)
+
+    default, per_type = thresholds or get_thresholds()
+    types = df['Type'] if 'Type' in df.columns else None
+
+    pressure = pd.to_numeric(df['Pressure'], errors='coerce').to_numpy(dtype=float)
+    temp = pd.to_numeric(df['Temperature'], errors='coerce').to_numpy(dtype=float)
+
+    critical_p = _threshold_column(types, 'critical_pressure', default, per_type)
+    critical_t = _threshold_column(types, 'critical_temp', default, per_type)
+    warning_p = _threshold_column(types, 'warning_pressure', default, per_type)
+
+    missing = np.isnan(pressure) | np.isnan(temp)
+    status = np.select(
+        [missing, (pressure > critical_p) & (temp > critical_t), pressure > warning_p],
+        [UNKNOWN, CRITICAL, WARNING],
+        default=OK,
+    )
+    return pd.Series(status, index=df.index, dtype=object)
@@ -0,0 +1,70 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import F, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+
+from .datasets import PageError
+from .models import EquipmentDataset
+
+# --- History Listing & Retention ---
+# History is listed newest first and paged with an opaque (uploaded_at, id)
+# keyset cursor instead of OFFSET, so every page is a range scan on the
+# (user, uploaded_at) index no matter how far back a user browses.
+#   GET /api/upload/?limit=5&cursor=<next from the previous page>
+
+HISTORY_FIELDS = ('id', 'file_name', 'uploaded_at', 'total_records')
+MAX_HISTORY_LIMIT = 100
+
+
+def encode_cursor(row):
+    raw = f"{row['uploaded_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        stamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(stamp), int(pk)
+    except (ValueError, binascii.Error):
+        raise PageError('Invalid cursor')
+
+
+def history_page(user, params=None):
+    """One page of ``user``'s history, newest first. Returns (rows, next_cursor)."""
+    params = params or {}
+    try:
+        limit = int(params.get('limit') or settings.HISTORY_PAGE_SIZE)
+    except ValueError:
+        raise PageError('limit must be an integer')
+    if not 0 < limit <= MAX_HISTORY_LIMIT:
+        raise PageError(f'limit must be between 1 and {MAX_HISTORY_LIMIT}')
+
+    datasets = EquipmentDataset.objects.filter(user=user)
+    cursor = params.get('cursor')
+    if cursor:
+        stamp, pk = decode_cursor(cursor)
+        datasets = datasets.filter(Q(uploaded_at__lt=stamp) | Q(uploaded_at=stamp, id__lt=pk))
+
+    # One extra row tells us whether another page exists
+    rows = list(datasets.order_by('-uploaded_at', '-id').values(*HISTORY_FIELDS)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def expired_datasets(user=None):
+    """All but the newest DATASET_RETENTION datasets of ``user``, or of every
+    user when ``user`` is None."""
+    keep = settings.DATASET_RETENTION
+    if not keep:
+        return EquipmentDataset.objects.none()
+    datasets = EquipmentDataset.objects.all() if user is None else EquipmentDataset.objects.filter(user=user)
+    ranked = datasets.annotate(rank=Window(
+        RowNumber(), partition_by=[F('user')], order_by=[F('uploaded_at').desc(), F('id').desc()],
+    ))
+    expired = ranked.filter(rank__gt=keep).values('id')
+    return EquipmentDataset.objects.filter(id__in=Subquery(expired))
+
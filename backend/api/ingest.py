@@ -0,0 +1,481 @@
+import hashlib
+import os
+from collections import Counter
+
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+
+from .datasets import analyzed_table, arrow_table, iter_frames, new_sidecar_name, widen_schema
+from .history import expired_datasets
+from .models import EquipmentDataset, EquipmentReading
+from .health import classify
+from .metrics import stage
+
+# --- Chunked Ingestion ---
+# Uploads are parsed UPLOAD_CHUNK_ROWS rows at a time. Each chunk is typed,
+# classified, folded into running stats and appended to the Arrow sidecar, so
+# peak memory depends on the chunk size rather than on the file size.
+
+NUMERIC_COLUMNS = ('Pressure', 'Temperature')
+GROUP_COLUMNS = ('Type', 'Equipment Name')
+
+# Per-equipment means kept in summary_stats, most frequent equipment first
+SUMMARY_MAX_EQUIPMENT = 500
+
+# Chunks of per-group partial sums collected before they are merged
+GROUP_MERGE_CHUNKS = 16
+
+# Group keys a saved accumulator state keeps per group column (see api.append)
+STATE_MAX_GROUPS = 10_000
+
+
+def chunk_rows():
+    return getattr(settings, 'UPLOAD_CHUNK_ROWS', 50_000)
+
+
+class StatsAccumulator:
+    """Running count, moments, extrema, group means and histograms over a stream of chunks.
+
+    Variance is merged chunk by chunk (Chan et al.), so the result matches a
+    one-shot computation without holding more than one chunk.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sums = {col: 0.0 for col in NUMERIC_COLUMNS}
+        self.valid = {col: 0 for col in NUMERIC_COLUMNS}
+        self.m2 = {col: 0.0 for col in NUMERIC_COLUMNS}
+        self.low = {col: None for col in NUMERIC_COLUMNS}
+        self.high = {col: None for col in NUMERIC_COLUMNS}
+        self.present = set()
+        self.types = Counter()
+        self.statuses = Counter()
+        self.groups = {} # group column -> per-chunk DataFrames of row counts and sums per key
+        self.dropped = set() # group columns whose sums were too many keys to save
+
+    def update(self, df):
+        self.count += len(df.index)
+        for col in NUMERIC_COLUMNS:
+            if col in df.columns:
+                self.present.add(col)
+                self._update_moments(col, pd.to_numeric(df[col], errors='coerce'))
+        if 'Type' in df.columns:
+            self.present.add('Type')
+            self.types.update(df['Type'].value_counts().to_dict())
+        if 'Status' in df.columns:
+            self.statuses.update(df['Status'].value_counts().to_dict())
+        self._update_groups(df)
+
+    def _update_moments(self, col, values):
+        n = int(values.count())
+        if not n:
+            return
+        total = float(values.sum())
+        mean = total / n
+        m2 = float(((values - mean) ** 2).sum())
+        seen = self.valid[col]
+        if seen:
+            delta = mean - self.sums[col] / seen
+            m2 += delta * delta * seen * n / (seen + n)
+        self.m2[col] += m2
+        self.sums[col] += total
+        self.valid[col] += n
+        low, high = float(values.min()), float(values.max())
+        self.low[col] = low if self.low[col] is None else min(self.low[col], low)
+        self.high[col] = high if self.high[col] is None else max(self.high[col], high)
+
+    def _update_groups(self, df):
+        for key in GROUP_COLUMNS:
+            if key not in df.columns or key in self.dropped:
+                continue
+            parts = {'rows': pd.Series(1, index=df.index)}
+            for col in NUMERIC_COLUMNS:
+                if col in df.columns:
+                    values = pd.to_numeric(df[col], errors='coerce')
+                    parts[f'{col} sum'] = values.fillna(0)
+                    parts[f'{col} n'] = values.notna().astype(int)
+            pending = self.groups.setdefault(key, [])
+            pending.append(pd.DataFrame(parts).groupby(df[key], sort=False).sum())
+            # Merging every chunk re-aligns all keys seen so far; batch it instead
+            if len(pending) >= GROUP_MERGE_CHUNKS:
+                self.groups[key] = [self._merged(key)]
+
+    def _merged(self, key):
+        pending = self.groups.get(key)
+        if not pending:
+            return None
+        return pd.concat(pending).groupby(level=0, sort=False).sum()
+
+    def _mean(self, col):
+        if col not in self.present or not self.valid[col]:
+            return 0
+        return round(self.sums[col] / self.valid[col], 2)
+
+    def _describe(self, col):
+        n = self.valid[col]
+        if col not in self.present or not n:
+            return None
+        return {
+            "count": n,
+            "min": round(self.low[col], 2),
+            "max": round(self.high[col], 2),
+            "mean": round(self.sums[col] / n, 2),
+            "std": round((self.m2[col] / (n - 1)) ** 0.5, 2) if n > 1 else 0.0,
+        }
+
+    def _group_means(self, key, limit=None):
+        if key in self.dropped:
+            return None
+        acc = self._merged(key)
+        if acc is None:
+            return {}
+        acc = acc.sort_values('rows', ascending=False, kind='stable')
+        if limit:
+            acc = acc.head(limit)
+        result = {}
+        for name, row in acc.iterrows():
+            means = {}
+            for col, field in (('Pressure', 'avg_pressure'), ('Temperature', 'avg_temp')):
+                n = row.get(f'{col} n', 0)
+                means[field] = round(float(row[f'{col} sum'] / n), 2) if n else None
+            result[str(name)] = {"count": int(row['rows']), **means}
+        return result
+
+    def result(self):
+        return {
+            "total_count": self.count,
+            "avg_pressure": self._mean('Pressure'),
+            "avg_temp": self._mean('Temperature'),
+            "type_distribution": dict(self.types.most_common()) if 'Type' in self.present else {},
+            "pressure": self._describe('Pressure'),
+            "temperature": self._describe('Temperature'),
+            "status_counts": dict(self.statuses.most_common()),
+            "by_type": self._group_means('Type'),
+            "by_equipment": self._group_means('Equipment Name', SUMMARY_MAX_EQUIPMENT),
+        }
+
+    def group_sums(self, key):
+        """Per-key ``rows`` and ``<column> sum``/``<column> n`` of group column
+        ``key`` as a DataFrame, or None when it has none (or was dropped)."""
+        return None if key in self.dropped else self._merged(key)
+
+    def state(self):
+        """JSON-able running totals, from which ``from_state`` resumes exactly.
+
+        A group column with more than STATE_MAX_GROUPS keys is saved as None;
+        its means then come back as None from ``result`` after resuming.
+        """
+        groups = {}
+        for key in GROUP_COLUMNS:
+            acc = self._merged(key)
+            if key in self.dropped or (acc is not None and len(acc.index) > STATE_MAX_GROUPS):
+                groups[key] = None
+            elif acc is not None:
+                groups[key] = {'keys': [str(name) for name in acc.index],
+                               **{col: acc[col].tolist() for col in acc.columns}}
+        return {
+            "count": self.count,
+            "sums": self.sums,
+            "valid": self.valid,
+            "m2": self.m2,
+            "low": self.low,
+            "high": self.high,
+            "present": sorted(self.present),
+            "types": dict(self.types),
+            "statuses": dict(self.statuses),
+            "groups": groups,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        acc = cls()
+        acc.count = state['count']
+        for name in ('sums', 'valid', 'm2', 'low', 'high'):
+            getattr(acc, name).update(state[name])
+        acc.present = set(state['present'])
+        acc.types = Counter(state['types'])
+        acc.statuses = Counter(state['statuses'])
+        for key, table in state['groups'].items():
+            if table is None:
+                acc.dropped.add(key)
+                continue
+            sums = {col: values for col, values in table.items() if col != 'keys'}
+            acc.groups[key] = [pd.DataFrame(sums, index=pd.Index(table['keys'], dtype=object))]
+        return acc
+
+
+def analyze_chunk(df):
+    """Type the measurement columns and attach Status, in place."""
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['Status'] = classify(df)
+    return df
+
+
+class HashingFile(File):
+    """Upload wrapper that SHA-256 hashes chunks as storage writes them."""
+
+    def __init__(self, file_obj):
+        super().__init__(file_obj, name=file_obj.name)
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self.sha256.update(chunk)
+            yield chunk
+
+
+def save_upload(file_obj):
+    """Save an uploaded file to default_storage. Returns (file_name, sha256 hex)."""
+    hashing = HashingFile(file_obj)
+    file_name = default_storage.save(file_obj.name, hashing)
+    return file_name, hashing.sha256.hexdigest()
+
+
+def find_duplicate(user, content_hash):
+    """Latest dataset of ``user`` with identical content whose CSV still exists.
+
+    Datasets past retention are skipped: compaction is about to delete them.
+    """
+    dataset = (EquipmentDataset.objects
+               .filter(user=user, content_hash=content_hash)
+               .exclude(pk__in=expired_datasets(user).values('pk'))
+               .order_by('-uploaded_at')
+               .first())
+    if dataset and default_storage.exists(dataset.file_name):
+        return dataset
+    return None
+
+
+def ingest_csv(file_path, file_name, rows=None, progress=None):
+    """Stream a saved CSV into stats and an Arrow sidecar.
+
+    Returns ``(stats, analyzed_file, columns)``. When a later chunk's types
+    drift from the sidecar schema (say, a column empty so far turns to
+    text), the schema is widened and the rows written so far are rewritten
+    with it. ``analyzed_file`` is ``''`` only if that fails too; history then
+    falls back to re-reading the CSV. Parse errors propagate to the caller.
+
+    ``progress``, if given, is called after each chunk with the fraction of
+    the file consumed so far.
+    """
+    stats = StatsAccumulator()
+    columns = []
+    sidecar_name = new_sidecar_name(file_name)
+    sidecar_path = os.path.join(settings.MEDIA_ROOT, sidecar_name)
+    writer = None
+    schema = None
+
+    try:
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size or 1
+            reader = pd.read_csv(f, chunksize=rows or chunk_rows())
+            while True:
+                with stage('read_csv'):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    break
+                with stage('classify'):
+                    analyze_chunk(chunk)
+                with stage('stats'):
+                    stats.update(chunk)
+                if progress:
+                    progress(min(f.tell() / size, 1.0))
+                if not columns:
+                    columns = list(chunk.columns)
+                if sidecar_name is None:
+                    continue
+                try:
+                    with stage('sidecar'):
+                        table = arrow_table(chunk)
+                        if writer is None:
+                            schema = table.schema
+                            writer = pa.ipc.new_file(sidecar_path, schema)
+                        elif not table.schema.equals(schema):
+                            wider = widen_schema(schema, table.schema)
+                            if not wider.equals(schema):
+                                writer.close()
+                                writer, sidecar_name = _widen_sidecar(sidecar_path, wider, file_name)
+                                sidecar_path = os.path.join(settings.MEDIA_ROOT, sidecar_name)
+                                schema = wider
+                            table = table.select(schema.names).cast(schema)
+                        writer.write_table(table)
+                except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError, TypeError):
+                    # Last resort when even the widened schema doesn't fit
+                    if writer is not None:
+                        writer.close()
+                        writer = None
+                    _remove(sidecar_path)
+                    sidecar_name = None
+    except Exception:
+        if writer is not None:
+            writer.close()
+        _remove(sidecar_path)
+        raise
+
+    if writer is None:
+        return stats.result(), '', columns
+    writer.close()
+    return stats.result(), sidecar_name, columns
+
+
+def _widen_sidecar(path, schema, file_name, remove_source=True):
+    """Copy the sidecar at ``path`` into a new one with ``schema``, a batch at a time.
+
+    Returns ``(writer, sidecar_name)`` with the writer left open for more rows.
+    The source file is removed unless ``remove_source`` is false.
+    """
+    sidecar_name = new_sidecar_name(file_name)
+    writer = pa.ipc.new_file(os.path.join(settings.MEDIA_ROOT, sidecar_name), schema)
+    try:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                writer.write_batch(reader.get_batch(i).cast(schema))
+    except Exception:
+        writer.close()
+        _remove(os.path.join(settings.MEDIA_ROOT, sidecar_name))
+        raise
+    if remove_source:
+        _remove(path)
+    return writer, sidecar_name
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def record_dataset(user, file_name, stats, analyzed_file, content_hash=''):
+    """Create the EquipmentDataset row; its readings are stored afterwards by
+    ``fill_readings`` (see api.jobs.schedule_readings).
+
+    Retention is applied later by media compaction (see api.compaction), so
+    uploads never pay for cleanup.
+    """
+    with stage('orm'):
+        return EquipmentDataset.objects.create(
+            user=user,
+            file_name=file_name,
+            analyzed_file=analyzed_file,
+            content_hash=content_hash,
+            total_records=stats['total_count'],
+            summary_stats=stats,
+            readings_pending=True,
+        )
+
+
+# --- Normalized Readings ---
+# Every analyzed row is also stored as an EquipmentReading so questions across
+# uploads can be answered in SQL (see api.readings). Rows are read back from
+# the sidecar a batch at a time and inserted with a raw executemany, which
+# skips building a model instance per row. New uploads are recorded with
+# readings_pending and filled on the job pool, off the request path.
+
+READING_FIELDS = (
+    ('Equipment Name', 'equipment_name'),
+    ('Type', 'equipment_type'),
+    ('Pressure', 'pressure'),
+    ('Temperature', 'temperature'),
+    ('Status', 'status'),
+)
+
+
+def _analyzed_frames(dataset, offset=0):
+    try:
+        table = analyzed_table(dataset)
+    except FileNotFoundError:
+        # No sidecar (an old upload, or drift even widening couldn't absorb): re-analyze the CSV
+        file_path = os.path.join(settings.MEDIA_ROOT, dataset.file_name)
+        skip = range(1, offset + 1) if offset else None
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows(), skiprows=skip):
+            yield analyze_chunk(chunk)
+        return
+    present = [col for col, _ in READING_FIELDS if col in table.column_names]
+    yield from iter_frames(table.select(present).slice(offset))
+
+
+def _reading_columns(df):
+    rows = len(df.index)
+    for col, field in READING_FIELDS:
+        if col not in df.columns:
+            values = [None] * rows if col in NUMERIC_COLUMNS else [''] * rows
+        elif col in NUMERIC_COLUMNS:
+            values = pd.to_numeric(df[col], errors='coerce').astype(object)
+            values = values.where(values.notna(), None).tolist()
+        else:
+            max_length = EquipmentReading._meta.get_field(field).max_length
+            values = [value[:max_length] for value in df[col].fillna('').astype(str)]
+        yield field, values
+
+
+def _insert_readings_sql():
+    opts = EquipmentReading._meta
+    columns = [opts.get_field(field).column for field in ('dataset', *(f for _, f in READING_FIELDS))]
+    return 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(opts.db_table),
+        ', '.join(connection.ops.quote_name(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+
+
+def store_readings(dataset, frames=None):
+    """Bulk-insert ``dataset``'s analyzed rows (or only ``frames``) as EquipmentReading.
+
+    Returns the count.
+    """
+    sql = _insert_readings_sql()
+    count = 0
+    with connection.cursor() as cursor:
+        for df in _analyzed_frames(dataset) if frames is None else frames:
+            # _reading_columns yields in READING_FIELDS order, matching the SQL
+            values = [column for _, column in _reading_columns(df)]
+            rows = [(dataset.pk, *row) for row in zip(*values)]
+            cursor.executemany(sql, rows)
+            count += len(rows)
+    return count
+
+
+def fill_readings(dataset_id):
+    """Store the readings of a dataset recorded with readings_pending.
+
+    Each batch is inserted in its own short transaction, so a large upload
+    never holds SQLite's write lock for long, and readings_stored records the
+    progress: an interrupted fill resumes where it stopped, and rows appended
+    meanwhile are stored before readings_pending is cleared. Stops once the
+    dataset is pruned. Returns the count stored.
+    """
+    count = 0
+    while True:
+        dataset = EquipmentDataset.objects.filter(pk=dataset_id, readings_pending=True).first()
+        if dataset is None:
+            return count
+        stored = dataset.readings_stored
+        for df in _analyzed_frames(dataset, stored):
+            rows = len(df.index)
+            with transaction.atomic():
+                # Claim the batch first: this fails if the dataset was pruned
+                # or another fill got ahead, and locks the row until commit
+                claimed = (EquipmentDataset.objects
+                           .filter(pk=dataset_id, readings_pending=True, readings_stored=stored)
+                           .update(readings_stored=stored + rows))
+                if not claimed:
+                    return count
+                with stage('readings'):
+                    store_readings(dataset, [df])
+            stored += rows
+            count += rows
+        done = (EquipmentDataset.objects
+                .filter(pk=dataset_id, readings_pending=True, readings_stored__gte=F('total_records'))
+                .update(readings_pending=False))
+        if done or stored == dataset.readings_stored:
+            return count
+        # Rows were appended while filling: store those too
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .compaction import compact
+from .ingest import fill_readings, ingest_csv, record_dataset
+from .models import UploadJob
+
+# --- Background Upload Jobs ---
+# Async uploads are analyzed on an in-process thread pool, so no broker is
+# needed. Job state lives in the database, which lets any worker process
+# answer /api/jobs/<id>/. Jobs still RUNNING when their process exits are
+# not resumed.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.UPLOAD_JOB_WORKERS,
+                thread_name_prefix='upload-job',
+            )
+        return _executor
+
+
+def submit_upload(user, file_name, content_hash='', duplicate=None):
+    """Queue analysis of an already saved upload and return its UploadJob.
+
+    A ``duplicate`` dataset yields a job that is already DONE. With
+    UPLOAD_JOB_WORKERS = 0 the job runs inline before returning.
+    """
+    if duplicate:
+        return UploadJob.objects.create(
+            user=user, file_name=duplicate.file_name, content_hash=content_hash,
+            status=UploadJob.DONE, progress=1.0, dataset=duplicate)
+
+    job = UploadJob.objects.create(user=user, file_name=file_name, content_hash=content_hash)
+    if settings.UPLOAD_JOB_WORKERS:
+        # Only hand the job to a worker once its row is visible to other connections
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_worker, job.pk))
+    else:
+        run_upload_job(job.pk)
+        job.refresh_from_db()
+    return job
+
+
+def schedule_readings(dataset_ids):
+    """Queue storing the readings of newly recorded datasets on the pool.
+
+    Their rows become visible to reading queries a moment after the upload
+    returns. With UPLOAD_JOB_WORKERS = 0 they are stored inline.
+    """
+    if not settings.UPLOAD_JOB_WORKERS:
+        for dataset_id in dataset_ids:
+            fill_readings(dataset_id)
+        return
+    dataset_ids = list(dataset_ids)
+    transaction.on_commit(lambda: _get_executor().submit(_fill_in_worker, dataset_ids))
+
+
+_last_compaction = None
+_compaction_lock = threading.Lock()
+
+
+def schedule_compaction():
+    """Queue media compaction on the pool, at most once per MEDIA_COMPACT_INTERVAL.
+
+    Called after uploads. Never runs inline: with no workers (or no interval)
+    compaction is left to `manage.py compact_media`.
+    """
+    global _last_compaction
+    if not settings.MEDIA_COMPACT_INTERVAL or not settings.UPLOAD_JOB_WORKERS:
+        return
+    with _compaction_lock:
+        now = time.monotonic()
+        if _last_compaction is not None and now - _last_compaction < settings.MEDIA_COMPACT_INTERVAL:
+            return
+        _last_compaction = now
+    transaction.on_commit(lambda: _get_executor().submit(_compact_in_worker))
+
+
+def _compact_in_worker():
+    close_old_connections()
+    try:
+        compact()
+    finally:
+        connection.close()
+
+
+def _fill_in_worker(dataset_ids):
+    close_old_connections()
+    try:
+        for dataset_id in dataset_ids:
+            try:
+                fill_readings(dataset_id)
+            except Exception:
+                # Left readings_pending; `manage.py backfill_readings` retries it
+                continue
+    finally:
+        connection.close()
+
+
+def _run_in_worker(job_id):
+    # Pool threads keep their own DB connection; don't leave it open between jobs
+    close_old_connections()
+    try:
+        run_upload_job(job_id)
+    finally:
+        connection.close()
+
+
+def _update(job_id, **fields):
+    # queryset.update() skips auto_now, so stamp updated_at explicitly
+    UploadJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def run_upload_job(job_id):
+    try:
+        job = UploadJob.objects.select_related('user').get(pk=job_id)
+        _update(job_id, status=UploadJob.RUNNING)
+
+        def report(fraction):
+            _update(job_id, progress=round(fraction, 3))
+
+        file_path = os.path.join(settings.MEDIA_ROOT, job.file_name)
+        try:
+            stats, analyzed_file, _ = ingest_csv(file_path, job.file_name, progress=report)
+        except Exception as e:
+            _update(job_id, status=UploadJob.FAILED, error=f"Invalid CSV format: {str(e)}")
+            return
+
+        dataset = record_dataset(job.user, job.file_name, stats, analyzed_file, job.content_hash)
+        # Already off the request path: the job is DONE once readings are queryable
+        fill_readings(dataset.pk)
+        _update(job_id, status=UploadJob.DONE, progress=1.0, dataset=dataset)
+        schedule_compaction()
+    except Exception as e:
+        _update(job_id, status=UploadJob.FAILED, error=str(e))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.ingest import fill_readings, store_readings
+from api.models import EquipmentDataset
+
+
+class Command(BaseCommand):
+    help = 'Store EquipmentReading rows for datasets uploaded before readings were recorded'
+
+    def handle(self, *args, **options):
+        missing = EquipmentDataset.objects.filter(readings__isnull=True).order_by('pk')
+        total = 0
+        for dataset in missing.iterator():
+            try:
+                if dataset.readings_pending:
+                    # An upload whose background fill never ran (e.g. the process exited)
+                    count = fill_readings(dataset.pk)
+                else:
+                    with transaction.atomic():
+                        count = store_readings(dataset)
+            except Exception as e:
+                self.stderr.write(f'{dataset.pk} {dataset.file_name}: {e}')
+                continue
+            total += count
+            self.stdout.write(f'{dataset.pk} {dataset.file_name}: {count} reading(s)')
+        self.stdout.write(f'Stored {total} reading(s).')
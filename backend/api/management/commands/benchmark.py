@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import benchmark_database, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Time classification, stats, serialization, upload and history detail on synthetic CSVs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+        parser.add_argument('--types', type=int, default=4, help='Number of distinct equipment types')
+        parser.add_argument('--missing', type=float, default=0.0, help='Fraction of empty cells per column')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+
+    def handle(self, *args, **options):
+        # Uploads write datasets and readings, so never touch the real database
+        with benchmark_database():
+            self.stdout.write(f'{"rows":>10}  {"stage":<16}{"seconds":>10}{"rows/s":>14}{"peak MB":>10}')
+            for rows in options['rows']:
+                results = run_benchmarks(
+                    rows, memory=not options['no_memory'],
+                    types=options['types'], missing=options['missing'], seed=options['seed'],
+                )
+                for result in results:
+                    peak = '-' if result['peak_mb'] is None else f"{result['peak_mb']:.1f}"
+                    self.stdout.write(
+                        f"{rows:>10,}  {result['stage']:<16}{result['seconds']:>10.3f}"
+                        f"{result['rows_per_sec']:>14,.0f}{peak:>10}"
+                    )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import auth_benchmark, benchmark_database
+
+
+class Command(BaseCommand):
+    help = 'Compare queries and latency per history poll with and without the token cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f'{"auth":<28}{"queries/req":>12}{"ms/req":>10}')
+            for result in auth_benchmark(options['requests']):
+                self.stdout.write(
+                    f"{result['auth']:<28}{result['queries_per_request']:>12.2f}{result['ms_per_request']:>10.2f}"
+                )
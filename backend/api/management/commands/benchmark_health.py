@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.health import classify
+from api.synthetic import synthetic_frame
+
+
+def legacy_check_health(row):
+    # Per-row rule the views used before api.health, kept for comparison
+    p = row.get('Pressure', 0)
+    t = row.get('Temperature', 0)
+    if p > 800 and t > 300: return 'CRITICAL'
+    elif p > 600: return 'WARNING'
+    return 'OK'
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/second of the legacy df.apply health check against api.health.classify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        df = synthetic_frame(rows, seed=options['seed'])
+
+        start = time.perf_counter()
+        legacy = df.apply(legacy_check_health, axis=1)
+        legacy_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized = classify(df)
+        vectorized_secs = time.perf_counter() - start
+
+        if not (legacy.to_numpy(dtype=object) == vectorized.to_numpy(dtype=object)).all():
+            self.stderr.write(self.style.WARNING('Vectorized statuses differ from legacy output'))
+
+        self.stdout.write(f'rows:        {rows}')
+        self.stdout.write(f'legacy:      {rows / legacy_secs:>14,.0f} rows/s ({legacy_secs:.3f}s)')
+        self.stdout.write(f'vectorized:  {rows / vectorized_secs:>14,.0f} rows/s ({vectorized_secs:.3f}s)')
+        self.stdout.write(self.style.SUCCESS(f'speedup:     {legacy_secs / vectorized_secs:.1f}x'))
@@ -0,0 +1,47 @@
+import json
+import time
+
+import pandas as pd
+import pyarrow as pa
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.health import classify
+from api.renderers import arrow_bytes
+from api.synthetic import synthetic_frame
+
+
+class Command(BaseCommand):
+    help = 'Compare payload size and client decode time of JSON records against the Arrow stream'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        df = synthetic_frame(rows, seed=options['seed'])
+        df['Status'] = classify(df)
+        header = {"stats": {"total_count": rows}}
+
+        start = time.perf_counter()
+        json_body = JSONRenderer().render({**header, "data": df.fillna('').to_dict(orient='records')})
+        json_encode = time.perf_counter() - start
+        start = time.perf_counter()
+        pd.DataFrame(json.loads(json_body)['data'])
+        json_decode = time.perf_counter() - start
+
+        start = time.perf_counter()
+        arrow_body = arrow_bytes(header, df)
+        arrow_encode = time.perf_counter() - start
+        start = time.perf_counter()
+        pa.ipc.open_stream(arrow_body).read_all().to_pandas()
+        arrow_decode = time.perf_counter() - start
+
+        self.stdout.write(f'rows:   {rows}')
+        self.stdout.write(f'{"":8}{"bytes":>14}{"encode":>12}{"decode":>12}')
+        self.stdout.write(f'{"json":8}{len(json_body):>14,}{json_encode:>11.3f}s{json_decode:>11.3f}s')
+        self.stdout.write(f'{"arrow":8}{len(arrow_body):>14,}{arrow_encode:>11.3f}s{arrow_decode:>11.3f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f'arrow is {len(json_body) / len(arrow_body):.1f}x smaller and decodes '
+            f'{json_decode / arrow_decode:.1f}x faster'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.compaction import compact
+
+
+class Command(BaseCommand):
+    help = 'Apply dataset retention and delete media files no dataset references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without deleting')
+        parser.add_argument('--grace', type=int, default=None,
+                            help='Keep files modified within this many seconds (default: MEDIA_COMPACT_GRACE)')
+
+    def handle(self, *args, **options):
+        result = compact(dry_run=options['dry_run'], grace=options['grace'])
+        prune, reclaim = ('Would prune', 'would reclaim') if options['dry_run'] else ('Pruned', 'reclaimed')
+        self.stdout.write(
+            f"{prune} {result['datasets']} dataset(s) with {result['readings']} reading(s) and "
+            f"{reclaim} {result['bytes']:,} bytes in {result['files']} file(s)."
+        )
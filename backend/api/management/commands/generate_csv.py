@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.synthetic import write_csv
+
+
+class Command(BaseCommand):
+    help = 'Write a synthetic equipment CSV for load testing or manual uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--types', type=int, default=4, help='Number of distinct equipment types')
+        parser.add_argument('--missing', type=float, default=0.0, help='Fraction of empty cells per column')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        size = write_csv(options['path'], options['rows'], types=options['types'],
+                         missing=options['missing'], seed=options['seed'])
+        self.stdout.write(f"Wrote {options['rows']:,} rows ({size:,} bytes) to {options['path']}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_equipmentdataset_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='analyzed_file',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_name', models.CharField(blank=True, default='', max_length=255)),
+                ('equipment_type', models.CharField(blank=True, default='', max_length=100)),
+                ('pressure', models.FloatField(blank=True, null=True)),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('status', models.CharField(max_length=16)),
+                ('dataset', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='readings', to='api.equipmentdataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dataset', 'equipment_type'], name='reading_dataset_type_idx'), models.Index(fields=['equipment_name', 'dataset'], name='reading_equipment_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_uploaded_at(apps, schema_editor):
+    EquipmentDataset = apps.get_model('api', 'EquipmentDataset')
+    EquipmentDataset.objects.update(updated_at=F('uploaded_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_equipmentreading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='appended_files',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='stats_state',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        # Existing datasets keep their ETags and cached reports
+        migrations.RunPython(copy_uploaded_at, migrations.RunPython.noop),
+    ]
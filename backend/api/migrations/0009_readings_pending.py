@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_dataset_append'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='readings_pending',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_readings_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='readings_stored',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_readings_stored'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group_column', models.CharField(max_length=32)),
+                ('group_key', models.CharField(max_length=255)),
+                ('rows', models.IntegerField(default=0)),
+                ('pressure_sum', models.FloatField(default=0)),
+                ('pressure_n', models.IntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('temperature_n', models.IntegerField(default=0)),
+                ('dataset', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='group_totals', to='api.equipmentdataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dataset', 'group_column', '-rows'], name='group_totals_rows_idx')],
+                'constraints': [models.UniqueConstraint(fields=('dataset', 'group_column', 'group_key'), name='group_totals_key_unique')],
+            },
+        ),
+    ]
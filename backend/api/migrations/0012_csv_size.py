@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_group_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentdataset',
+            name='csv_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
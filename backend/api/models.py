@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -6,9 +8,105 @@ class EquipmentDataset(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Changes when rows are appended (see api.append); versions ETags and reports
+    updated_at = models.DateTimeField(auto_now=True)
     file_name = models.CharField(max_length=255)
     total_records = models.IntegerField(default=0)
     summary_stats = models.JSONField(default=dict) 
 
+    # Arrow sidecar holding the analyzed frame (see api.datasets)
+    analyzed_file = models.CharField(max_length=255, blank=True, default='')
+    # Sidecar segments holding appended rows, read after analyzed_file in order
+    appended_files = models.JSONField(default=list, blank=True)
+
+    # Exact running totals behind summary_stats, saved on the first append
+    stats_state = models.JSONField(default=dict, blank=True)
+    # Bytes of the stored CSV as of the last committed append (None before
+    # one); anything past it was written by an append that rolled back
+    csv_size = models.BigIntegerField(null=True, blank=True)
+
+    # Set until the upload's EquipmentReading rows are stored (see api.jobs.schedule_readings);
+    # readings_stored counts the rows stored so far, in sidecar order
+    readings_pending = models.BooleanField(default=False)
+    readings_stored = models.IntegerField(default=0)
+
+    # SHA-256 of the uploaded CSV, used to short-circuit identical re-uploads
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+
+    class Meta:
+        # History listing and retention both walk a user's uploads newest first
+        indexes = [models.Index(fields=['user', '-uploaded_at'], name='dataset_user_uploaded_idx')]
+
+    def __str__(self):
+        return f"{self.file_name} - {self.uploaded_at} ({self.user.username if self.user else 'Anon'})"
+
+class EquipmentReading(models.Model):
+    """One analyzed CSV row, so readings can be queried across uploads (see api.readings)."""
+    # Like UploadJob.dataset: media compaction deletes the datasets retention
+    # prunes, then their readings, without cascading through the ORM
+    dataset = models.ForeignKey(EquipmentDataset, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='readings')
+    equipment_name = models.CharField(max_length=255, blank=True, default='')
+    equipment_type = models.CharField(max_length=100, blank=True, default='')
+    pressure = models.FloatField(null=True, blank=True)
+    temperature = models.FloatField(null=True, blank=True)
+    status = models.CharField(max_length=16)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dataset', 'equipment_type'], name='reading_dataset_type_idx'),
+            models.Index(fields=['equipment_name', 'dataset'], name='reading_equipment_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_name} ({self.equipment_type}) - {self.status}"
+
+class GroupTotals(models.Model):
+    """Row count and reading sums of one key of a dataset's group column, for
+    columns with too many keys to keep in stats_state (see api.append)."""
+    # Pruned together with the dataset by media compaction, like its readings
+    dataset = models.ForeignKey(EquipmentDataset, on_delete=models.DO_NOTHING, db_constraint=False,
+                                related_name='group_totals')
+    group_column = models.CharField(max_length=32)
+    group_key = models.CharField(max_length=255)
+    rows = models.IntegerField(default=0)
+    pressure_sum = models.FloatField(default=0)
+    pressure_n = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0)
+    temperature_n = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['dataset', 'group_column', 'group_key'],
+                                               name='group_totals_key_unique')]
+        # The summary lists the most frequent keys first
+        indexes = [models.Index(fields=['dataset', 'group_column', '-rows'], name='group_totals_rows_idx')]
+
+    def __str__(self):
+        return f"{self.group_column}={self.group_key} ({self.rows} rows)"
+
+class UploadJob(models.Model):
+    """Background analysis of an upload submitted in async mode (see api.jobs)."""
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [(s, s.title()) for s in (PENDING, RUNNING, DONE, FAILED)]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.FloatField(default=0)
+    error = models.TextField(blank=True, default='')
+    # No DB constraint or cascade: media compaction deletes the datasets
+    # retention prunes in batches (see api.compaction), which may leave
+    # finished jobs pointing at a gone dataset
+    dataset = models.ForeignKey(EquipmentDataset, on_delete=models.DO_NOTHING, db_constraint=False,
+                                null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.file_name} - {self.uploaded_at} ({self.user.username if self.user else 'Anon'})"
\ No newline at end of file
+        return f"{self.file_name} - {self.status} ({self.progress:.0%})"
@@ -0,0 +1,59 @@
+from django.db.models import Avg, Count, Max, Min
+
+from .datasets import PageError
+from .models import EquipmentReading
+
+# --- Reading Queries ---
+# Aggregates over EquipmentReading rows, computed by the database rather than
+# by loading files. Filters and grouping map onto the indexed columns:
+#   GET /api/readings/stats/?group_by=equipment&type=Pump&status=CRITICAL
+
+GROUP_FIELDS = {
+    'type': 'equipment_type',
+    'equipment': 'equipment_name',
+    'status': 'status',
+    'dataset': 'dataset_id',
+}
+FILTER_FIELDS = {
+    'dataset': 'dataset_id',
+    'type': 'equipment_type',
+    'equipment': 'equipment_name',
+    'status': 'status',
+}
+MAX_GROUPS = 1000
+
+
+def reading_stats(user, params):
+    """Count, mean, min and max readings of ``user``'s datasets per group."""
+    group_by = params.get('group_by') or 'type'
+    if group_by not in GROUP_FIELDS:
+        raise PageError(f"group_by must be one of: {', '.join(GROUP_FIELDS)}")
+    try:
+        limit = int(params.get('limit') or 100)
+    except ValueError:
+        raise PageError('limit must be an integer')
+    if not 0 < limit <= MAX_GROUPS:
+        raise PageError(f'limit must be between 1 and {MAX_GROUPS}')
+
+    readings = EquipmentReading.objects.filter(dataset__user=user)
+    for param, field in FILTER_FIELDS.items():
+        value = params.get(param)
+        if value:
+            if field == 'dataset_id' and not value.isdigit():
+                raise PageError('dataset must be an integer')
+            readings = readings.filter(**{field: value})
+
+    key = GROUP_FIELDS[group_by]
+    groups = (readings.values(key)
+              .annotate(count=Count('id'),
+                        avg_pressure=Avg('pressure'), min_pressure=Min('pressure'), max_pressure=Max('pressure'),
+                        avg_temp=Avg('temperature'), min_temp=Min('temperature'), max_temp=Max('temperature'))
+              .order_by('-count', key)[:limit])
+    return [
+        {"key": row.pop(key), **{name: _round(value) for name, value in row.items()}}
+        for row in groups
+    ]
+
+
+def _round(value):
+    return round(value, 2) if isinstance(value, float) else value
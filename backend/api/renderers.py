@@ -0,0 +1,126 @@
+import json
+
+import pyarrow as pa
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .concurrency import run_cpu
+from .datasets import arrow_table, iter_frames, to_records
+
+# --- Dataset Renderers ---
+# Besides plain JSON, dataset endpoints negotiate two bulk formats:
+#   application/x-ndjson                  header line, then one record per line
+#   application/vnd.apache.arrow.stream   Arrow IPC stream; the header travels
+#                                         as JSON in the schema metadata
+# Views build these responses via ``dataset_response``; the renderers
+# themselves only handle ordinary payloads such as errors.
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return _line(data)
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return arrow_bytes(data, pa.table({}))
+
+
+DATASET_RENDERERS = [NDJSONRenderer, ArrowStreamRenderer]
+
+
+class ArtifactRenderer(BaseRenderer):
+    """Negotiation target for binary artifacts such as rendered reports.
+
+    Views return the artifact itself as a ready-made HttpResponse, so only
+    errors reach ``render``; those go out as JSON.
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return _line(data)
+
+
+class PDFRenderer(ArtifactRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+class PNGRenderer(ArtifactRenderer):
+    media_type = 'image/png'
+    format = 'png'
+
+ARROW_HEADER_KEY = b'chemvis.header'
+
+
+def _line(obj):
+    return (json.dumps(obj, cls=JSONEncoder) + '\n').encode('utf-8')
+
+
+def ndjson_response(header, rows, asynchronous=False):
+    """Stream ``header`` followed by ``rows`` one batch at a time.
+
+    Time to first byte does not depend on the dataset size, and only one
+    batch of records is held as Python objects at any moment. Under ASGI
+    (``asynchronous``) the body is an async iterator that serializes each
+    batch on the analysis pool; Django would otherwise buffer a sync one.
+    """
+    def generate():
+        yield _line(header)
+        for frame in iter_frames(rows):
+            records = frame.fillna('').to_dict(orient='records')
+            yield b''.join(_line(record) for record in records)
+
+    async def agenerate(batches):
+        while (chunk := await run_cpu(next, batches, None)) is not None:
+            yield chunk
+
+    content = agenerate(generate()) if asynchronous else generate()
+    return StreamingHttpResponse(content, content_type=NDJSONRenderer.media_type)
+
+
+def arrow_bytes(header, rows):
+    """Serialize ``rows`` as an Arrow IPC stream carrying ``header`` in its metadata.
+
+    DataFrame rows come from the CSV fallback, whose object columns may mix
+    numbers and text; those go out as strings.
+    """
+    table = rows if isinstance(rows, pa.Table) else arrow_table(rows)
+    metadata = dict(table.schema.metadata or {})
+    metadata[ARROW_HEADER_KEY] = json.dumps(header, cls=JSONEncoder).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def dataset_response(request, header, rows):
+    """Render a dataset page in whichever format the client negotiated."""
+    fmt = getattr(request.accepted_renderer, 'format', None)
+    if fmt == NDJSONRenderer.format:
+        return ndjson_response(header, rows, isinstance(request._request, ASGIRequest))
+    if fmt == ArrowStreamRenderer.format:
+        return HttpResponse(arrow_bytes(header, rows), content_type=ArrowStreamRenderer.media_type)
+    return Response({**header, "data": to_records(rows)})
@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .datasets import load_present
+from .ingest import analyze_chunk
+
+# --- Server-side Reports ---
+# The PDF report and its charts are rendered headlessly from a few columns of
+# the sidecar, so clients never download rows just to print a report. Figures
+# use the Agg canvas directly (no pyplot state), which is safe on request
+# threads. Artifacts are cached per dataset version (appending rows starts a
+# new one), so a cached artifact only goes stale when REPORT_VERSION does.
+
+REPORT_VERSION = 1 # bump when the report layout changes
+
+CHARTS = ('bar', 'pie')
+SUMMARY_COLUMNS = ('Type', 'Pressure', 'Temperature', 'Status')
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+
+def cache_key(dataset, artifact):
+    version = hashlib.sha256('|'.join((
+        str(REPORT_VERSION),
+        dataset.content_hash or dataset.file_name,
+        dataset.updated_at.isoformat(),
+    )).encode('utf-8')).hexdigest()[:16]
+    return f'report:{dataset.pk}:{version}:{artifact}'
+
+
+def get_artifact(dataset, artifact):
+    """PDF (``'pdf'``) or chart PNG bytes for ``dataset``, rendered at most once
+    per dataset version while the cache holds it."""
+    key = cache_key(dataset, artifact)
+    content = cache.get(key)
+    if content is None:
+        content = render_pdf(dataset) if artifact == 'pdf' else render_chart(dataset, artifact)
+        cache.set(key, content, settings.REPORT_CACHE_TIMEOUT)
+    return content
+
+
+def summary_frame(dataset):
+    """The columns reports need, from the sidecar or (older uploads) the CSV."""
+    try:
+        return load_present(dataset, SUMMARY_COLUMNS)
+    except FileNotFoundError:
+        file_path = os.path.join(settings.MEDIA_ROOT, dataset.file_name)
+        return analyze_chunk(pd.read_csv(file_path, usecols=lambda c: c in SUMMARY_COLUMNS))
+
+
+def type_summary(df):
+    """Per-Type row count and mean readings, most common Type first."""
+    if 'Type' not in df.columns:
+        return pd.DataFrame(columns=['count', 'Pressure', 'Temperature'])
+    readings = df.reindex(columns=['Type', 'Pressure', 'Temperature'])
+    grouped = readings.groupby('Type')
+    summary = grouped[['Pressure', 'Temperature']].mean()
+    summary.insert(0, 'count', grouped.size())
+    return summary.sort_values('count', ascending=False, kind='stable')
+
+
+def _reading(value):
+    return '-' if pd.isna(value) else f"{value:.2f}"
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buf)
+    return buf.getvalue()
+
+
+def render_chart(dataset, name):
+    fig = Figure(figsize=(5, 4), dpi=100)
+    axes = fig.add_subplot()
+    if name == 'pie':
+        dist = dataset.summary_stats.get('type_distribution', {})
+        if dist:
+            axes.pie(dist.values(), labels=dist.keys(), autopct='%1.1f%%')
+        axes.set_title('Type Distribution')
+    else:
+        summary = type_summary(summary_frame(dataset))
+        x = range(len(summary.index))
+        w = 0.35
+        axes.bar([i - w / 2 for i in x], summary['Pressure'].fillna(0), w, label='Press', color='#36A2EB')
+        axes.bar([i + w / 2 for i in x], summary['Temperature'].fillna(0), w, label='Temp', color='#FF6384')
+        axes.set_xticks(list(x))
+        axes.set_xticklabels([f"{t} (n={n})" for t, n in summary['count'].items()], rotation=45, ha='right')
+        axes.set_title('Average Readings by Type')
+        axes.legend()
+    fig.tight_layout()
+    return _png(fig)
+
+
+def render_pdf(dataset):
+    df = summary_frame(dataset)
+    stats = dataset.summary_stats
+    styles = getSampleStyleSheet()
+
+    elements = [
+        Paragraph("Chemical Equipment Report", styles['Title']),
+        Paragraph(f"{dataset.file_name}, uploaded {dataset.uploaded_at:%Y-%m-%d %H:%M}", styles['Normal']),
+        Paragraph(f"Generated on {timezone.now():%Y-%m-%d %H:%M}", styles['Normal']),
+        Spacer(1, 20),
+    ]
+
+    charts = [Image(io.BytesIO(get_artifact(dataset, name)), width=250, height=200) for name in CHARTS]
+    elements += [Table([charts]), Spacer(1, 20)]
+
+    elements.append(Paragraph("Summary", styles['Heading2']))
+    elements.append(Table([
+        ["Metric", "Value"],
+        ["Total records", f"{stats.get('total_count', dataset.total_records):,}"],
+        ["Avg pressure", f"{stats.get('avg_pressure', 0):g}"],
+        ["Avg temperature", f"{stats.get('avg_temp', 0):g}"],
+    ], hAlign='LEFT', style=TABLE_STYLE))
+
+    if 'Status' in df.columns:
+        elements += [Spacer(1, 12), Paragraph("Health Status", styles['Heading2'])]
+        counts = df['Status'].value_counts()
+        elements.append(Table([["Status", "Rows"]] + [[s, f"{n:,}"] for s, n in counts.items()],
+                              hAlign='LEFT', style=TABLE_STYLE))
+
+    summary = type_summary(df)
+    if len(summary.index):
+        elements += [Spacer(1, 12), Paragraph("By Type", styles['Heading2'])]
+        rows = [[t, f"{n:,}", _reading(p), _reading(temp)]
+                for t, n, p, temp in summary.itertuples()]
+        elements.append(Table([["Type", "Rows", "Avg Pressure", "Avg Temp"]] + rows,
+                              hAlign='LEFT', repeatRows=1, style=TABLE_STYLE))
+
+    buf = io.BytesIO()
+    SimpleDocTemplate(buf, pagesize=letter).build(elements)
+    return buf.getvalue()
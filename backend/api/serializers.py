@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import EquipmentDataset
+from django.urls import reverse
+from .models import EquipmentDataset, UploadJob
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,4 +17,17 @@ class UserSerializer(serializers.ModelSerializer):
 class EquipmentDatasetSerializer(serializers.ModelSerializer):
     class Meta:
         model = EquipmentDataset
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    # Where to fetch the analyzed dataset once the job is DONE
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadJob
+        fields = ('id', 'file_name', 'status', 'progress', 'error', 'dataset', 'result_url', 'created_at', 'updated_at')
+
+    def get_result_url(self, job):
+        if not job.dataset_id:
+            return None
+        return reverse('history_detail', kwargs={'pk': job.dataset_id})
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+# --- Synthetic Equipment Data ---
+# Reproducible equipment frames/CSVs shaped like real uploads, shared by the
+# benchmark commands and tests.
+
+EQUIPMENT_TYPES = ('Reactor', 'Pump', 'Heat Exchanger', 'Valve', 'Compressor', 'Condenser')
+
+
+def synthetic_frame(rows, types=4, missing=0.0, seed=0):
+    """``rows`` readings over the first ``types`` EQUIPMENT_TYPES.
+
+    ``missing`` is the fraction of Type, Pressure and Temperature cells left
+    empty (independently per column). Equipment names repeat, one per ten
+    rows, so per-equipment aggregates have something to aggregate.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Equipment Name': [f'EQ-{i}' for i in rng.integers(0, max(rows // 10, 1), rows)],
+        'Type': rng.choice(EQUIPMENT_TYPES[:max(1, min(types, len(EQUIPMENT_TYPES)))], rows),
+        'Pressure': rng.uniform(0, 1000, rows).round(1),
+        'Temperature': rng.uniform(0, 400, rows).round(1),
+    })
+    if missing:
+        for col in ('Type', 'Pressure', 'Temperature'):
+            df.loc[rng.random(rows) < missing, col] = np.nan
+    return df
+
+
+def write_csv(path, rows, **options):
+    """Write ``synthetic_frame(rows, **options)`` to ``path``. Returns the file size."""
+    synthetic_frame(rows, **options).to_csv(path, index=False)
+    with open(path, 'rb') as f:
+        return f.seek(0, 2)
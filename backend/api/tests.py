@@ -1,3 +1,891 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import warnings
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import cache_key
+from . import ingest
+from .benchmarks import auth_benchmark, run_benchmarks
+from .compaction import compact, prune_datasets
+from .concurrency import run_cpu
+from .datasets import load_analyzed
+from .health import classify
+from .metrics import registry
+from .history import expired_datasets
+from .ingest import fill_readings, ingest_csv
+from .models import EquipmentDataset, EquipmentReading, GroupTotals, UploadJob
+from .synthetic import synthetic_frame
+
+
+class ClassifyTests(SimpleTestCase):
+    def test_matches_legacy_rules(self):
+        df = pd.DataFrame({
+            'Pressure': [850, 850, 650, 500],
+            'Temperature': [320, 200, 400, 100],
+        })
+        self.assertEqual(classify(df).tolist(), ['CRITICAL', 'WARNING', 'WARNING', 'OK'])
+
+    def test_missing_readings_are_unknown(self):
+        df = pd.DataFrame({'Pressure': [None, 'n/a', 700], 'Temperature': [310, 310, None]})
+        self.assertEqual(classify(df).tolist(), ['UNKNOWN', 'UNKNOWN', 'UNKNOWN'])
+        self.assertEqual(classify(pd.DataFrame({'Pressure': [900]})).tolist(), ['UNKNOWN'])
+
+    @override_settings(EQUIPMENT_HEALTH_THRESHOLDS={'Pump': {'warning_pressure': 700}})
+    def test_per_type_thresholds(self):
+        df = pd.DataFrame({
+            'Type': ['Pump', 'Reactor'],
+            'Pressure': [650, 650],
+            'Temperature': [50, 50],
+        })
+        self.assertEqual(classify(df).tolist(), ['OK', 'WARNING'])
+
+
+class DatasetApiTestCase(TestCase):
+    """Authenticated client with MEDIA_ROOT redirected to a temp directory."""
+
+    csv_text = (
+        'Equipment Name,Type,Pressure,Temperature\n'
+        'Reactor-A,Reactor,850,320\n'
+        'Pump-X12,Pump,650,45\n'
+        'HeatEx-01,Heat Exchanger,120,65\n'
+    )
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        self.user = User.objects.create_user('operator', password='pw-12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, text=None, name='equipment.csv', **extra):
+        text = self.csv_text if text is None else text
+        upload = SimpleUploadedFile(name, text.encode(), content_type='text/csv')
+        return self.client.post('/api/upload/', {'file': upload}, format='multipart', **extra)
+
+
+class AnalyzedSidecarTests(DatasetApiTestCase):
+    def test_upload_writes_sidecar_used_by_history(self):
+        self.assertEqual(self.upload().status_code, 200)
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        self.assertTrue(dataset.analyzed_file.endswith('.arrow'))
+
+        # The raw CSV is no longer needed to serve history
+        os.remove(os.path.join(self.media_root, dataset.file_name))
+        res = self.client.get(f'/api/history/{dataset.pk}/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([r['Status'] for r in res.data['data']], ['CRITICAL', 'WARNING', 'OK'])
+
+    def test_history_falls_back_to_csv_without_sidecar(self):
+        self.upload()
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        EquipmentDataset.objects.filter(pk=dataset.pk).update(analyzed_file='')
+        res = self.client.get(f'/api/history/{dataset.pk}/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data['data']), 3)
+
+
+class PagingTests(DatasetApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload()
+        self.dataset = EquipmentDataset.objects.get(user=self.user)
+        self.url = f'/api/history/{self.dataset.pk}/'
+
+    def test_sorted_projected_page(self):
+        res = self.client.get(self.url, {'sort': '-Pressure', 'columns': 'Equipment Name,Status', 'offset': 1, 'limit': 1})
+        self.assertEqual(res.data['data'], [{'Equipment Name': 'Pump-X12', 'Status': 'WARNING'}])
+        self.assertEqual(res.data['page']['total'], 3)
+        self.assertEqual(res.data['page']['columns'], ['Equipment Name', 'Status'])
+
+    def test_csv_fallback_pages_identically(self):
+        params = {'sort': 'Temperature', 'limit': 2}
+        from_sidecar = self.client.get(self.url, params).data['data']
+        EquipmentDataset.objects.filter(pk=self.dataset.pk).update(analyzed_file='')
+        self.assertEqual(self.client.get(self.url, params).data['data'], from_sidecar)
+
+    def test_zero_limit_returns_only_stats(self):
+        res = self.client.get(self.url, {'limit': 0})
+        self.assertEqual(res.data['data'], [])
+        self.assertEqual(res.data['stats']['total_count'], 3)
+
+    def test_invalid_params_are_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'columns': 'Nope'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 'ten'}).status_code, 400)
+        self.assertEqual(self.upload(QUERY_STRING='sort=Nope').status_code, 400)
+
+
+class ChunkedIngestTests(DatasetApiTestCase):
+    def write_csv(self, rows):
+        rng = np.random.default_rng(7)
+        df = pd.DataFrame({
+            'Equipment Name': [f'EQ-{i}' for i in range(rows)],
+            'Type': rng.choice(['Reactor', 'Pump', 'Valve'], rows),
+            'Pressure': rng.uniform(0, 1000, rows).round(1),
+            'Temperature': rng.uniform(0, 400, rows).round(1),
+        })
+        df.loc[::17, 'Pressure'] = np.nan
+        df.loc[::23, 'Type'] = np.nan
+        path = os.path.join(self.media_root, 'big.csv')
+        df.to_csv(path, index=False)
+        return path
+
+    def test_chunked_stats_match_one_shot(self):
+        path = self.write_csv(1000)
+        stats, analyzed_file, columns = ingest_csv(path, 'big.csv', rows=97)
+
+        df = pd.read_csv(path)
+        self.assertEqual({k: stats[k] for k in ('total_count', 'avg_pressure', 'avg_temp', 'type_distribution')}, {
+            "total_count": int(len(df)),
+            "avg_pressure": round(df['Pressure'].mean(), 2),
+            "avg_temp": round(df['Temperature'].mean(), 2),
+            "type_distribution": df['Type'].value_counts().to_dict(),
+        })
+        pressure = df['Pressure']
+        self.assertEqual(stats['pressure'], {
+            "count": int(pressure.count()), "min": round(pressure.min(), 2), "max": round(pressure.max(), 2),
+            "mean": round(pressure.mean(), 2), "std": round(pressure.std(), 2),
+        })
+        self.assertEqual(stats['status_counts'], classify(df).value_counts().to_dict())
+        by_type = df.groupby('Type')['Temperature'].mean().round(2).to_dict()
+        self.assertEqual({t: g['avg_temp'] for t, g in stats['by_type'].items()}, by_type)
+        self.assertEqual(stats['by_equipment']['EQ-17'], {"count": 1, "avg_pressure": None, "avg_temp": df['Temperature'][17]})
+        self.assertEqual(columns, ['Equipment Name', 'Type', 'Pressure', 'Temperature', 'Status'])
+
+        sidecar = load_analyzed(EquipmentDataset(analyzed_file=analyzed_file))
+        self.assertEqual(sidecar['Status'].tolist(), classify(df).tolist())
+
+    def test_schema_drift_widens_the_sidecar(self):
+        path = os.path.join(self.media_root, 'drift.csv')
+        with open(path, 'w') as f:
+            f.write('Equipment Name,Tag,Notes,Pressure,Temperature\n'
+                    'A,1,,700,10\nB,2,,650,20\nC,x-2,,900,310\nD,3,check seal,700.5,12\n')
+        stats, analyzed_file, _ = ingest_csv(path, 'drift.csv', rows=2)
+        self.assertEqual(stats['total_count'], 4)
+        # The rows written before the drift were copied to a widened sidecar
+        self.assertEqual(sorted(os.listdir(self.media_root)), sorted(['drift.csv', analyzed_file]))
+
+        sidecar = load_analyzed(EquipmentDataset(analyzed_file=analyzed_file))
+        self.assertEqual(sidecar['Tag'].tolist(), ['1', '2', 'x-2', '3'])
+        self.assertEqual(sidecar['Notes'].isna().tolist(), [True, True, True, False])
+        self.assertEqual(sidecar['Pressure'].tolist(), [700, 650, 900, 700.5])
+
+    def test_history_without_sidecar_reads_the_csv(self):
+        dataset = EquipmentDataset.objects.get(pk=self.upload().data['history_id'])
+        os.remove(os.path.join(self.media_root, dataset.analyzed_file))
+        res = self.client.get(f'/api/history/{dataset.pk}/')
+        self.assertEqual(res.data['page']['total'], 3)
+
+
+class NDJSONStreamingTests(DatasetApiTestCase):
+    def read_lines(self, res):
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(res.streaming_content).splitlines()]
+
+    def test_history_streams_header_then_records(self):
+        self.upload()
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        res = self.client.get(f'/api/history/{dataset.pk}/', {'columns': 'Status'}, HTTP_ACCEPT='application/x-ndjson')
+        header, *records = self.read_lines(res)
+        self.assertEqual(header['history_id'], dataset.pk)
+        self.assertEqual(header['page']['total'], 3)
+        self.assertEqual(records, [{'Status': 'CRITICAL'}, {'Status': 'WARNING'}, {'Status': 'OK'}])
+
+    def test_upload_streams_and_errors_stay_ndjson(self):
+        header, *records = self.read_lines(self.upload(HTTP_ACCEPT='application/x-ndjson'))
+        self.assertEqual(header['stats']['total_count'], 3)
+        self.assertEqual(len(header['history']), 1)
+        self.assertEqual(len(records), 3)
+
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        res = self.client.get(f'/api/history/{dataset.pk}/', {'limit': 'x'}, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('error', json.loads(res.content))
+
+
+@override_settings(UPLOAD_JOB_WORKERS=0)
+class AsyncUploadTests(DatasetApiTestCase):
+    def test_async_upload_reports_finished_dataset(self):
+        res = self.upload(QUERY_STRING='async=1')
+        self.assertEqual(res.status_code, 202)
+        job = self.client.get(res['Location']).data
+        self.assertEqual(job['status'], 'DONE')
+        self.assertEqual(job['progress'], 1.0)
+
+        detail = self.client.get(job['result_url'])
+        self.assertEqual(detail.data['stats']['total_count'], 3)
+
+    def test_failed_job_is_private_to_its_owner(self):
+        res = self.upload(text='', QUERY_STRING='async=1')
+        job = UploadJob.objects.get(pk=res.data['id'])
+        self.assertEqual(job.status, UploadJob.FAILED)
+        self.assertIn('Invalid CSV format', job.error)
+
+        other = User.objects.create_user('other', password='pw-12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(res['Location']).status_code, 404)
+
+
+class DeduplicationTests(DatasetApiTestCase):
+    def test_identical_reupload_reuses_analysis(self):
+        first = self.upload()
+        files_before = sorted(os.listdir(self.media_root))
+        second = self.upload(name='renamed.csv')
+
+        self.assertFalse(first.data['deduplicated'])
+        self.assertTrue(second.data['deduplicated'])
+        self.assertEqual(second.data['history_id'], first.data['history_id'])
+        self.assertEqual(second.data['data'], first.data['data'])
+        self.assertEqual(EquipmentDataset.objects.count(), 1)
+        self.assertEqual(sorted(os.listdir(self.media_root)), files_before)
+
+    def test_changed_content_or_other_user_is_processed(self):
+        self.upload()
+        self.assertFalse(self.upload(self.csv_text + 'Valve-9,Valve,10,10\n').data['deduplicated'])
+
+        self.client.force_authenticate(User.objects.create_user('other', password='pw-12345'))
+        self.assertFalse(self.upload().data['deduplicated'])
+        self.assertEqual(EquipmentDataset.objects.count(), 3)
+
+    @override_settings(UPLOAD_JOB_WORKERS=0)
+    def test_async_duplicate_is_done_immediately(self):
+        first = self.upload()
+        job = self.upload(QUERY_STRING='async=1').data
+        self.assertEqual(job['status'], 'DONE')
+        self.assertEqual(job['dataset'], first.data['history_id'])
+
+
+class ConditionalGetTests(DatasetApiTestCase):
+    def test_history_detail_revalidates_with_304(self):
+        self.upload()
+        url = f"/api/history/{EquipmentDataset.objects.get(user=self.user).pk}/"
+        first = self.client.get(url)
+        self.assertIn('ETag', first)
+        self.assertIn('Last-Modified', first)
+
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b'')
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+        # A different page is a different representation
+        paged = self.client.get(url, {'limit': 1}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(paged.status_code, 200)
+        self.assertNotEqual(paged['ETag'], first['ETag'])
+
+    def test_history_list_etag_changes_after_upload(self):
+        self.upload()
+        first = self.client.get('/api/upload/')
+        self.assertEqual(self.client.get('/api/upload/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.upload(self.csv_text + 'Valve-9,Valve,10,10\n')
+        res = self.client.get('/api/upload/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data['history']), 2)
+
+
+class ArrowTransportTests(DatasetApiTestCase):
+    accept = 'application/vnd.apache.arrow.stream'
+
+    def test_history_detail_as_arrow_stream(self):
+        self.upload()
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        res = self.client.get(f'/api/history/{dataset.pk}/', {'sort': 'Pressure'}, HTTP_ACCEPT=self.accept)
+        self.assertEqual(res['Content-Type'], self.accept)
+
+        table = pa.ipc.open_stream(res.content).read_all()
+        header = json.loads(table.schema.metadata[b'chemvis.header'])
+        self.assertEqual(header['stats']['total_count'], 3)
+        self.assertEqual(table.column('Pressure').to_pylist(), [120.0, 650.0, 850.0])
+        self.assertEqual(table.column('Status').to_pylist(), ['OK', 'WARNING', 'CRITICAL'])
+
+    def test_mixed_type_csv_fallback_as_arrow_stream(self):
+        self.upload()
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        # What pandas' chunked parsing makes of a large CSV mixing ids and labels
+        rows = pd.DataFrame({'Equipment Name': ['Pump-1', 'Valve-1'], 'Tag': pd.Series([101, 'spare'], dtype=object)})
+        with mock.patch('api.views.open_page', return_value=(rows, 2)):
+            res = self.client.get(f'/api/history/{dataset.pk}/', HTTP_ACCEPT=self.accept)
+        self.assertEqual(res.status_code, 200)
+        table = pa.ipc.open_stream(res.content).read_all()
+        self.assertEqual(table.column('Tag').to_pylist(), ['101', 'spare'])
+
+    def test_errors_travel_in_metadata(self):
+        res = self.upload(QUERY_STRING='limit=-1', HTTP_ACCEPT=self.accept)
+        self.assertEqual(res.status_code, 400)
+        schema = pa.ipc.open_stream(res.content).schema
+        self.assertIn('error', json.loads(schema.metadata[b'chemvis.header']))
+
+
+class ReportTests(DatasetApiTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.upload()
+        self.dataset = EquipmentDataset.objects.get(user=self.user)
+
+    def test_report_is_rendered_once_and_served_from_cache(self):
+        res = self.client.get(f'/api/history/{self.dataset.pk}/report/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/pdf')
+        self.assertTrue(res.content.startswith(b'%PDF'))
+
+        # Repeat requests never touch the data files again
+        os.remove(os.path.join(self.media_root, self.dataset.file_name))
+        os.remove(os.path.join(self.media_root, self.dataset.analyzed_file))
+        again = self.client.get(f'/api/history/{self.dataset.pk}/report/')
+        self.assertEqual(again.content, res.content)
+        self.assertEqual(self.client.get(f'/api/history/{self.dataset.pk}/report/bar.png').status_code, 200)
+
+        not_modified = self.client.get(f'/api/history/{self.dataset.pk}/report/', HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_chart_png_and_errors(self):
+        res = self.client.get(f'/api/history/{self.dataset.pk}/report/pie.png', HTTP_ACCEPT='image/png')
+        self.assertEqual(res['Content-Type'], 'image/png')
+        self.assertTrue(res.content.startswith(b'\x89PNG'))
+
+        self.assertEqual(self.client.get(f'/api/history/{self.dataset.pk}/report/line.png').status_code, 404)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', password='pw-12345'))
+        self.assertEqual(other.get(f'/api/history/{self.dataset.pk}/report/').status_code, 404)
+
+
+class HistoryTests(DatasetApiTestCase):
+    def test_keyset_pages_cover_history_once(self):
+        created = [EquipmentDataset.objects.create(user=self.user, file_name=f'{i}.csv').pk for i in range(7)]
+        EquipmentDataset.objects.create(user=User.objects.create_user('other'), file_name='x.csv')
+
+        seen, cursor = [], None
+        while True:
+            res = self.client.get('/api/upload/', {'limit': 3, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(res.status_code, 200)
+            seen += [h['id'] for h in res.data['history']]
+            cursor = res.data['next']
+            if not cursor:
+                break
+        self.assertEqual(seen, created[::-1])
+
+        self.assertEqual(self.client.get('/api/upload/', {'cursor': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/upload/', {'limit': 0}).status_code, 400)
+
+    @override_settings(DATASET_RETENTION=2)
+    def test_retention_prunes_datasets_with_their_readings(self):
+        oldest, *_ = [EquipmentDataset.objects.create(user=self.user, file_name=f'{i}.csv') for i in range(3)]
+        UploadJob.objects.create(user=self.user, file_name=oldest.file_name, dataset=oldest)
+        EquipmentReading.objects.create(dataset=oldest, equipment_name='Pump-1')
+        with self.assertNumQueries(1):
+            expired = list(expired_datasets(self.user).values_list('id', flat=True))
+        self.assertEqual(expired, [oldest.pk])
+
+        self.assertEqual(prune_datasets(expired), (1, 1))
+        self.assertFalse(EquipmentDataset.objects.filter(pk=oldest.pk).exists())
+        self.assertFalse(EquipmentReading.objects.filter(dataset_id=oldest.pk).exists())
+
+
+@override_settings(DATASET_RETENTION=2, UPLOAD_JOB_WORKERS=0)
+class CompactionTests(DatasetApiTestCase):
+    def test_compaction_prunes_rows_and_reclaims_their_files(self):
+        for i in range(3):
+            self.upload(self.csv_text + f'Extra-{i},Pump,1,1\n', name=f'{i}.csv')
+        # Uploads themselves no longer clean up
+        self.assertEqual(EquipmentDataset.objects.filter(user=self.user).count(), 3)
+        oldest = EquipmentDataset.objects.order_by('uploaded_at').first()
+        stray = os.path.join(self.media_root, 'stray.csv')
+        with open(stray, 'w') as f:
+            f.write('x')
+
+        out = StringIO()
+        call_command('compact_media', '--grace=0', '--dry-run', stdout=out)
+        self.assertIn('Would prune 1 dataset(s) with 4 reading(s)', out.getvalue())
+        self.assertIn('in 3 file(s)', out.getvalue())
+        self.assertEqual(EquipmentDataset.objects.filter(user=self.user).count(), 3)
+        preview = compact(dry_run=True, grace=0)
+
+        result = compact(grace=0)
+        self.assertEqual(result, preview)
+        self.assertEqual((result['datasets'], result['files']), (1, 3))
+        self.assertEqual(sorted(os.listdir(self.media_root)), sorted(
+            name for d in EquipmentDataset.objects.all() for name in (d.file_name, d.analyzed_file)))
+        self.assertNotIn(oldest.file_name, os.listdir(self.media_root))
+        self.assertEqual(result['readings'], 4)
+        self.assertFalse(EquipmentReading.objects.filter(dataset_id=oldest.pk).exists())
+
+        # Files younger than the grace period may belong to an upload in progress
+        with open(stray, 'w') as f:
+            f.write('x')
+        self.assertEqual(compact()['files'], 0)
+
+    def test_expired_dataset_is_not_a_duplicate(self):
+        first = self.upload().data['history_id']
+        for i in range(2):
+            self.upload(self.csv_text + f'Extra-{i},Pump,1,1\n', name=f'{i}.csv')
+
+        res = self.upload()
+        self.assertFalse(res.data['deduplicated'])
+        self.assertNotEqual(res.data['history_id'], first)
+        compact(grace=0)
+        self.assertEqual(self.client.get(f"/api/history/{res.data['history_id']}/").status_code, 200)
+
+
+@override_settings(UPLOAD_JOB_WORKERS=0)
+class ReadingTests(DatasetApiTestCase):
+    def test_upload_stores_typed_readings(self):
+        self.upload()
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        readings = dataset.readings.order_by('pk')
+        self.assertEqual(
+            [(r.equipment_name, r.equipment_type, r.pressure, r.temperature, r.status) for r in readings],
+            [('Reactor-A', 'Reactor', 850.0, 320.0, 'CRITICAL'),
+             ('Pump-X12', 'Pump', 650.0, 45.0, 'WARNING'),
+             ('HeatEx-01', 'Heat Exchanger', 120.0, 65.0, 'OK')])
+
+    def test_stats_are_aggregated_in_sql(self):
+        self.upload()
+        self.upload(self.csv_text + 'Pump-Y,Pump,,50\n', name='second.csv')
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', password='pw-12345'))
+        other.post('/api/upload/', {'file': SimpleUploadedFile('o.csv', self.csv_text.encode())}, format='multipart')
+
+        res = self.client.get('/api/readings/stats/', {'group_by': 'type', 'type': 'Pump'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['groups'], [{
+            'key': 'Pump', 'count': 3,
+            'avg_pressure': 650.0, 'min_pressure': 650.0, 'max_pressure': 650.0,
+            'avg_temp': 46.67, 'min_temp': 45.0, 'max_temp': 50.0,
+        }])
+
+        by_status = self.client.get('/api/readings/stats/', {'group_by': 'status'}).data['groups']
+        self.assertEqual({g['key']: g['count'] for g in by_status},
+                         {'CRITICAL': 2, 'WARNING': 2, 'OK': 2, 'UNKNOWN': 1})
+        self.assertEqual(self.client.get('/api/readings/stats/', {'group_by': 'colour'}).status_code, 400)
+
+    @override_settings(UPLOAD_JOB_WORKERS=2)
+    def test_readings_are_filled_after_the_upload(self):
+        with self.captureOnCommitCallbacks():
+            self.assertEqual(self.upload().status_code, 200)
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        self.assertTrue(dataset.readings_pending)
+        self.assertFalse(dataset.readings.exists())
+
+        self.assertEqual(fill_readings(dataset.pk), 3)
+        self.assertEqual(fill_readings(dataset.pk), 0)
+        dataset.refresh_from_db()
+        self.assertFalse(dataset.readings_pending)
+        self.assertEqual(dataset.readings.count(), 3)
+
+        with self.captureOnCommitCallbacks():
+            self.upload(self.csv_text + 'Pump-Y,Pump,,50\n', name='second.csv')
+        pruned = EquipmentDataset.objects.get(file_name__startswith='second')
+        pruned.delete()
+        self.assertEqual(fill_readings(pruned.pk), 0)
+        self.assertFalse(EquipmentReading.objects.filter(dataset_id=pruned.pk).exists())
+
+    @override_settings(UPLOAD_JOB_WORKERS=2)
+    def test_fill_commits_per_batch_and_resumes(self):
+        with self.captureOnCommitCallbacks():
+            pk = self.upload().data['history_id']
+            # Rows appended before the fill runs are stored by the fill
+            append = SimpleUploadedFile('new.csv', b'Equipment Name,Type,Pressure,Temperature\nValve-3,Valve,10,20\n')
+            self.assertEqual(self.client.post(f'/api/history/{pk}/append/', {'file': append},
+                                              format='multipart').status_code, 200)
+        self.assertFalse(EquipmentReading.objects.filter(dataset_id=pk).exists())
+
+        def one_row_batches(table):
+            return (table.slice(i, 1).to_pandas() for i in range(table.num_rows))
+
+        real_store = ingest.store_readings
+        calls = []
+
+        def failing_store(dataset, frames=None):
+            calls.append(dataset.pk)
+            if len(calls) == 3:
+                raise RuntimeError('worker stopped')
+            return real_store(dataset, frames)
+
+        with mock.patch('api.ingest.iter_frames', one_row_batches):
+            with mock.patch('api.ingest.store_readings', failing_store), self.assertRaises(RuntimeError):
+                fill_readings(pk)
+            # Each batch committed on its own: two are kept, the failed one is not
+            self.assertEqual(EquipmentDataset.objects.get(pk=pk).readings_stored, 2)
+            self.assertEqual(EquipmentReading.objects.filter(dataset_id=pk).count(), 2)
+            self.assertEqual(fill_readings(pk), 2)
+
+        dataset = EquipmentDataset.objects.get(pk=pk)
+        self.assertFalse(dataset.readings_pending)
+        self.assertEqual(list(dataset.readings.order_by('pk').values_list('equipment_name', flat=True)),
+                         ['Reactor-A', 'Pump-X12', 'HeatEx-01', 'Valve-3'])
+
+
+class TrendsTests(DatasetApiTestCase):
+    def test_equipment_pressure_across_uploads(self):
+        self.upload()
+        self.upload(self.csv_text.replace('Pump-X12,Pump,650', 'Pump-X12,Pump,700') + 'Valve-9,Valve,10,10\n')
+
+        res = self.client.get('/api/trends/', {'by': 'equipment', 'keys': 'Pump-X12,Valve-9'})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data['uploads']), 2)
+        self.assertEqual(res.data['series'], {'Pump-X12': [650.0, 700.0], 'Valve-9': [None, 10.0]})
+
+        by_type = self.client.get('/api/trends/', {'by': 'type', 'metric': 'count'}).data['series']
+        self.assertEqual(by_type['Valve'], [None, 1])
+        overall = self.client.get('/api/trends/').data['series']
+        self.assertEqual(overall, {'all': [540.0, 420.0]})
+
+        with self.assertNumQueries(1):
+            self.client.get('/api/trends/', {'by': 'equipment'})
+        self.assertEqual(self.client.get('/api/trends/', {'metric': 'humidity'}).status_code, 400)
+
+
+class BenchmarkTests(DatasetApiTestCase):
+    def test_synthetic_frame_is_reproducible(self):
+        df = synthetic_frame(2000, types=2, missing=0.1, seed=3)
+        self.assertTrue(df.equals(synthetic_frame(2000, types=2, missing=0.1, seed=3)))
+        self.assertEqual(df['Type'].nunique(), 2)
+        self.assertAlmostEqual(df['Pressure'].isna().mean(), 0.1, delta=0.03)
+
+    def test_every_stage_runs(self):
+        results = list(run_benchmarks(300, memory=False, missing=0.05))
+        self.assertEqual([r['stage'] for r in results], [
+            'classify', 'stats', 'serialize_json', 'serialize_arrow', 'upload', 'history_json', 'history_arrow'])
+        self.assertTrue(all(r['seconds'] > 0 and r['rows'] == 300 for r in results))
+
+
+class MetricsTests(DatasetApiTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+    def test_upload_reports_stage_timings(self):
+        res = self.upload()
+        stages = [entry.split(';')[0] for entry in res['Server-Timing'].split(', ')]
+        self.assertEqual(stages, ['save', 'dedup', 'read_csv', 'classify', 'stats', 'sidecar',
+                                  'orm', 'open', 'serialize', 'total'])
+
+        metrics = self.client.get('/api/metrics/')
+        self.assertEqual(metrics.status_code, 200)
+        text = metrics.content.decode()
+        self.assertIn('# TYPE chemvis_request_duration_seconds histogram', text)
+        self.assertIn('chemvis_request_duration_seconds_count{method="POST",status="200",view="upload"} 1', text)
+        self.assertIn('chemvis_stage_duration_seconds_bucket{stage="read_csv",le="+Inf"} 1', text)
+
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='10.0.0.8').status_code, 403)
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled_metrics_add_nothing(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.get('/api/upload/')
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(registry.exposition(), '\n')
+
+
+class CachedTokenAuthTests(TestCase):
+    def setUp(self):
+        caches['auth'].clear()
+        self.addCleanup(caches['auth'].clear)
+        User.objects.create_user('operator', password='pw-12345')
+        self.client = APIClient()
+        self.token = self.client.post('/api/login/', {'username': 'operator', 'password': 'pw-12345'}).data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_repeat_requests_skip_the_token_lookup(self):
+        self.assertEqual(self.client.get('/api/upload/').status_code, 200)
+        with self.assertNumQueries(1): # the history query only
+            self.assertEqual(self.client.get('/api/upload/').status_code, 200)
+
+    def test_logout_and_deactivation_invalidate(self):
+        self.client.get('/api/upload/')
+        self.assertEqual(self.client.post('/api/logout/').status_code, 204)
+        self.assertIsNone(caches['auth'].get(cache_key(self.token)))
+        self.assertEqual(self.client.get('/api/upload/').status_code, 401)
+
+        self.client.credentials()
+        token = self.client.post('/api/login/', {'username': 'operator', 'password': 'pw-12345'}).data['token']
+        self.assertNotEqual(token, self.token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.client.get('/api/upload/')
+        User.objects.filter(username='operator').update(is_active=False) # bypasses signals: cached until TTL
+        self.assertEqual(self.client.get('/api/upload/').status_code, 200)
+        user = User.objects.get(username='operator')
+        user.save()
+        self.assertEqual(self.client.get('/api/upload/').status_code, 401)
+
+    def test_benchmark_halves_queries(self):
+        results = {r['auth']: r['queries_per_request'] for r in auth_benchmark(requests=5)}
+        self.assertEqual(results, {'TokenAuthentication': 2, 'CachedTokenAuthentication': 1})
+
+
+class AsgiViewTests(DatasetApiTestCase):
+    """Upload and history views served through the async handler."""
+
+    def setUp(self):
+        super().setUp()
+        token = Token.objects.create(user=self.user)
+        self.async_client = AsyncClient()
+        self.auth = {'Authorization': f'Token {token.key}'}
+
+    async def test_upload_and_history_under_asgi(self):
+        upload = SimpleUploadedFile('equipment.csv', self.csv_text.encode(), content_type='text/csv')
+        res = await self.async_client.post('/api/upload/', {'file': upload}, headers=self.auth)
+        self.assertEqual(res.status_code, 200)
+        body = res.json()
+        self.assertEqual(body['stats']['total_count'], 3)
+        self.assertIn('read_csv', res['Server-Timing'])
+
+        detail = await self.async_client.get(f"/api/history/{body['history_id']}/", {'limit': 1},
+                                              headers=self.auth)
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(len(detail.json()['data']), 1)
+        self.assertEqual((await self.async_client.get('/api/history/999/', headers=self.auth)).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/upload/')).status_code, 401)
+
+    async def test_ndjson_streams_asynchronously(self):
+        upload = SimpleUploadedFile('equipment.csv', self.csv_text.encode(), content_type='text/csv')
+        body = (await self.async_client.post('/api/upload/', {'file': upload}, headers=self.auth)).json()
+
+        res = await self.async_client.get(f"/api/history/{body['history_id']}/",
+                                          headers={**self.auth, 'Accept': 'application/x-ndjson'})
+        self.assertTrue(res.is_async)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            lines = b''.join([chunk async for chunk in res]).splitlines()
+        self.assertEqual(json.loads(lines[0])['stats']['total_count'], 3)
+        self.assertEqual([json.loads(line)['Status'] for line in lines[1:]], ['CRITICAL', 'WARNING', 'OK'])
+
+    async def test_history_is_served_while_analysis_is_busy(self):
+        release = threading.Event()
+        busy = asyncio.ensure_future(run_cpu(release.wait, 10))
+        try:
+            res = await self.async_client.get('/api/upload/', headers=self.auth)
+            self.assertEqual(res.status_code, 200)
+            self.assertFalse(busy.done())
+        finally:
+            release.set()
+        self.assertTrue(await busy)
+
+
+@override_settings(UPLOAD_JOB_WORKERS=0)
+class BatchUploadTests(DatasetApiTestCase):
+    def csv_file(self, name, text=None):
+        return SimpleUploadedFile(name, (text or self.csv_text).encode(), content_type='text/csv')
+
+    def zip_file(self, name, members):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for member, text in members.items():
+                archive.writestr(member, text)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='application/zip')
+
+    def post(self, *files):
+        return self.client.post('/api/upload/batch/', {'files': list(files)}, format='multipart')
+
+    def test_csvs_and_zip_members_become_datasets(self):
+        pump_csv = self.csv_text + 'Pump-Y7,Pump,500,40\n'
+        archive = self.zip_file('shift.zip', {
+            'unit-2/pumps.csv': pump_csv,
+            '__MACOSX/unit-2/._pumps.csv': 'junk',
+            'notes.txt': 'not a csv',
+        })
+        res = self.post(self.csv_file('unit-1.csv'), archive, self.csv_file('broken.csv', '"unclosed\n'))
+        self.assertEqual(res.status_code, 200)
+
+        files = res.data['files']
+        self.assertEqual([f['file'] for f in files], ['unit-1.csv', 'shift.zip/unit-2/pumps.csv', 'broken.csv'])
+        self.assertEqual(files[0]['stats']['total_count'], 3)
+        self.assertEqual(files[1]['stats']['total_count'], 4)
+        self.assertIn('Invalid CSV format', files[2]['error'])
+
+        self.assertEqual(EquipmentDataset.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(EquipmentReading.objects.filter(dataset_id=files[1]['history_id']).count(), 4)
+        self.assertEqual(len(res.data['history']), 2)
+        # The failed CSV is not kept around
+        self.assertFalse(any(name.startswith('broken') for name in os.listdir(self.media_root)))
+
+        again = self.post(self.csv_file('unit-1-again.csv'))
+        self.assertTrue(again.data['files'][0]['deduplicated'])
+        self.assertEqual(again.data['files'][0]['history_id'], files[0]['history_id'])
+
+    def test_repeated_files_within_a_batch_share_a_dataset(self):
+        archive = self.zip_file('shift.zip', {'copy.csv': self.csv_text})
+        res = self.post(self.csv_file('a.csv'), self.csv_file('b.csv'), archive)
+        self.assertEqual(res.status_code, 200)
+        files = res.data['files']
+        self.assertEqual([f['deduplicated'] for f in files], [False, True, True])
+        self.assertEqual({f['history_id'] for f in files}, {files[0]['history_id']})
+        dataset = EquipmentDataset.objects.get(user=self.user)
+        self.assertEqual(sorted(os.listdir(self.media_root)), sorted([dataset.file_name, dataset.analyzed_file]))
+
+    @override_settings(DATASET_RETENTION=2)
+    def test_batch_larger_than_retention_is_recorded_with_a_warning(self):
+        texts = [self.csv_text + f'Extra-{i},Pump,1,1\n' for i in range(3)]
+        files = [self.csv_file(f'{i}.csv', text) for i, text in enumerate(texts)]
+        res = self.post(*files, self.csv_file('broken.csv', '"unclosed\n'))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(EquipmentDataset.objects.count(), 3)
+        self.assertIn('3 datasets were created but only the newest 2 are kept', res.data['warning'])
+
+        # Copies and unparseable files create no dataset, so they don't count
+        res = self.post(self.csv_file('a.csv', self.csv_text), self.csv_file('b.csv', self.csv_text),
+                        self.csv_file('broken.csv', '"unclosed\n'))
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('warning', res.data)
+
+    @override_settings(BATCH_MAX_FILES=2)
+    def test_oversized_batch_is_rejected_whole(self):
+        res = self.post(self.csv_file('a.csv'), self.zip_file('b.zip', {'b.csv': self.csv_text, 'c.csv': self.csv_text}))
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('at most 2', res.data['error'])
+        self.assertEqual(os.listdir(self.media_root), [])
+        self.assertEqual(self.post().status_code, 400)
+
+
+@override_settings(UPLOAD_JOB_WORKERS=0)
+class AppendTests(DatasetApiTestCase):
+    extra_text = (
+        'Equipment Name,Type,Pressure,Temperature\n'
+        'Pump-X12,Pump,710.5,52\n'
+        'Valve-3,Valve,,20\n'
+    )
+    more_text = (
+        'Type,Equipment Name,Pressure,Temperature\n'
+        'Reactor,Reactor-A,880,330\n'
+    )
+
+    def append(self, pk, text):
+        upload = SimpleUploadedFile('new-rows.csv', text.encode(), content_type='text/csv')
+        return self.client.post(f'/api/history/{pk}/append/', {'file': upload}, format='multipart')
+
+    def full_stats(self, *texts):
+        path = os.path.join(self.media_root, 'full.csv')
+        frames = [pd.read_csv(StringIO(text)) for text in texts]
+        pd.concat(frames)[frames[0].columns].to_csv(path, index=False)
+        stats, _, _ = ingest_csv(path, 'full.csv')
+        return stats
+
+    def test_appended_rows_update_stats_like_a_full_upload(self):
+        pk = self.upload().data['history_id']
+        etag = self.client.get(f'/api/history/{pk}/')['ETag']
+
+        res = self.append(pk, self.extra_text)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['appended'], 2)
+        self.assertEqual(res.data['stats'], self.full_stats(self.csv_text, self.extra_text))
+
+        # Later appends resume from the saved totals, columns in any order
+        dataset = EquipmentDataset.objects.get(pk=pk)
+        self.assertEqual(dataset.stats_state['count'], 5)
+        res = self.append(pk, self.more_text)
+        self.assertEqual(res.data['total_records'], 6)
+        self.assertEqual(res.data['stats'], self.full_stats(self.csv_text, self.extra_text, self.more_text))
+
+        detail = self.client.get(f'/api/history/{pk}/', {'sort': '-Pressure'})
+        self.assertNotEqual(detail['ETag'], etag)
+        self.assertEqual(detail.data['page']['total'], 6)
+        self.assertEqual(detail.data['data'][0]['Equipment Name'], 'Reactor-A')
+        self.assertEqual(detail.data['data'][0]['Pressure'], 880)
+        self.assertEqual(EquipmentReading.objects.filter(dataset_id=pk).count(), 6)
+        # Fractional pressures after an all-integer upload still land in the sidecar
+        dataset.refresh_from_db()
+        self.assertTrue(dataset.analyzed_file)
+        self.assertEqual(len(dataset.appended_files), 2)
+        self.assertEqual(len(pd.read_csv(os.path.join(self.media_root, dataset.file_name)).index), 6)
+
+        # The grown dataset no longer answers for the original upload
+        self.assertFalse(self.upload().data['deduplicated'])
+
+    def test_rejects_mismatched_columns_and_foreign_datasets(self):
+        pk = self.upload().data['history_id']
+        res = self.append(pk, 'Equipment Name,Pressure\nX,1\n')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('Columns must match', res.data['error'])
+
+        other = User.objects.create_user('other', password='pw-12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.append(pk, self.extra_text).status_code, 404)
+
+    def test_column_changing_type_widens_the_sidecar(self):
+        pk = self.upload('Equipment Name,Type,Tag\nPump-1,Pump,1\nPump-2,Pump,2\n').data['history_id']
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.append(pk, 'Equipment Name,Type,Tag\nPump-3,Pump,x-3\n')
+        self.assertEqual(res.status_code, 200)
+
+        dataset = EquipmentDataset.objects.get(pk=pk)
+        self.assertTrue(dataset.analyzed_file)
+        self.assertEqual(len(dataset.appended_files), 1)
+        self.assertEqual(sorted(os.listdir(self.media_root)),
+                         sorted([dataset.file_name, dataset.analyzed_file, *dataset.appended_files]))
+        detail = self.client.get(f'/api/history/{pk}/', {'columns': 'Tag'})
+        self.assertEqual([row['Tag'] for row in detail.data['data']], ['1', '2', 'x-3'])
+
+    def test_segments_are_merged_by_size(self):
+        base = self.csv_text + ''.join(f'Pump-{i},Pump,{i},{i}\n' for i in range(500))
+        pk = self.upload(base).data['history_id']
+        analyzed_file = EquipmentDataset.objects.get(pk=pk).analyzed_file
+        with self.captureOnCommitCallbacks(execute=True):
+            for text in (self.extra_text, self.more_text) * 4:
+                self.assertEqual(self.append(pk, text).status_code, 200)
+
+        dataset = EquipmentDataset.objects.get(pk=pk)
+        # Small segments merge among themselves; the large upload is never rewritten
+        self.assertEqual(dataset.analyzed_file, analyzed_file)
+        self.assertLessEqual(len(dataset.appended_files), 3)
+        self.assertEqual(sorted(os.listdir(self.media_root)),
+                         sorted([dataset.file_name, dataset.analyzed_file, *dataset.appended_files]))
+        detail = self.client.get(f'/api/history/{pk}/', {'offset': 503, 'columns': 'Pressure'})
+        self.assertEqual(detail.data['page']['total'], 515)
+        self.assertEqual([row['Pressure'] for row in detail.data['data']][:3], [710.5, '', 880.0])
+
+    def test_retried_append_writes_its_rows_once(self):
+        pk = self.upload().data['history_id']
+        self.append(pk, self.more_text)
+        with mock.patch.object(EquipmentDataset, 'save', side_effect=OperationalError('database is locked')):
+            self.assertEqual(self.append(pk, self.extra_text).status_code, 503)
+        self.assertEqual(self.append(pk, self.extra_text).status_code, 200)
+
+        dataset = EquipmentDataset.objects.get(pk=pk)
+        stored = pd.read_csv(os.path.join(self.media_root, dataset.file_name))
+        self.assertEqual(list(stored['Equipment Name']),
+                         ['Reactor-A', 'Pump-X12', 'HeatEx-01', 'Reactor-A', 'Pump-X12', 'Valve-3'])
+        self.assertEqual(dataset.total_records, len(stored.index))
+
+    def test_locked_database_asks_the_client_to_retry(self):
+        pk = self.upload().data['history_id']
+        with mock.patch('api.views.append_rows', side_effect=OperationalError('database is locked')):
+            res = self.append(pk, self.extra_text)
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res['Retry-After'], '1')
+
+    def test_groups_too_large_to_save_are_kept_in_sql(self):
+        pk = self.upload().data['history_id']
+        with mock.patch('api.ingest.STATE_MAX_GROUPS', 2):
+            self.append(pk, self.extra_text)
+            self.assertIsNone(EquipmentDataset.objects.get(pk=pk).stats_state['groups']['Type'])
+            self.assertEqual(GroupTotals.objects.get(dataset_id=pk, group_column='Type', group_key='Pump').rows, 2)
+            res = self.append(pk, self.more_text)
+        self.assertEqual(res.data['stats'], self.full_stats(self.csv_text, self.extra_text, self.more_text))
+        self.assertEqual(GroupTotals.objects.get(dataset_id=pk, group_column='Type', group_key='Reactor').rows, 2)
@@ -0,0 +1,68 @@
+from .datasets import PageError
+from .models import EquipmentDataset
+
+# --- Trends ---
+# Compares a user's uploads over time using only the aggregates stored in
+# summary_stats at upload time: one indexed query, no files or readings.
+#   GET /api/trends/?metric=pressure&by=equipment&keys=Pump-X12,Reactor-A
+
+# metric -> (field inside a group's means, overall summary_stats key)
+METRICS = {
+    'pressure': ('avg_pressure', 'avg_pressure'),
+    'temp': ('avg_temp', 'avg_temp'),
+    'count': ('count', 'total_count'),
+}
+# by -> summary_stats key holding the per-group aggregates (None: whole dataset)
+GROUPINGS = {
+    'dataset': None,
+    'type': 'by_type',
+    'equipment': 'by_equipment',
+}
+MAX_UPLOADS = 100
+MAX_SERIES = 50
+
+
+def _choice(params, name, choices, default):
+    value = params.get(name) or default
+    if value not in choices:
+        raise PageError(f"{name} must be one of: {', '.join(choices)}")
+    return value
+
+
+def trends(user, params):
+    """Per-upload series of ``metric`` for each group key, oldest upload first.
+
+    Series values are None for uploads where the key is absent, including
+    uploads analyzed before per-group aggregates were stored.
+    """
+    metric = _choice(params, 'metric', METRICS, 'pressure')
+    by = _choice(params, 'by', GROUPINGS, 'dataset')
+    try:
+        limit = int(params.get('limit') or 20)
+    except ValueError:
+        raise PageError('limit must be an integer')
+    if not 0 < limit <= MAX_UPLOADS:
+        raise PageError(f'limit must be between 1 and {MAX_UPLOADS}')
+    keys = [k.strip() for k in params.get('keys', '').split(',') if k.strip()]
+
+    datasets = list(EquipmentDataset.objects
+                    .filter(user=user)
+                    .order_by('-uploaded_at', '-id')
+                    .values('id', 'file_name', 'uploaded_at', 'summary_stats')[:limit])
+    datasets.reverse()
+
+    field, overall = METRICS[metric]
+    group = GROUPINGS[by]
+    if group is None:
+        series = {'all': [d['summary_stats'].get(overall) for d in datasets]}
+    else:
+        groups = [d['summary_stats'].get(group) or {} for d in datasets]
+        if not keys:
+            # Most recent uploads first, so the newest groups are never cut off
+            for stats in reversed(groups):
+                keys += [k for k in stats if k not in keys]
+            keys = keys[:MAX_SERIES]
+        series = {key: [(stats.get(key) or {}).get(field) for stats in groups] for key in keys}
+
+    uploads = [{k: d[k] for k in ('id', 'file_name', 'uploaded_at')} for d in datasets]
+    return {"metric": metric, "by": by, "uploads": uploads, "series": series}
@@ -1,9 +1,19 @@
 from django.urls import path
-from .views import EquipmentUploadView, EquipmentHistoryDetailView, register_user, login_user
+from .metrics import metrics_view
+from .views import BatchUploadView, DatasetAppendView, EquipmentUploadView, EquipmentHistoryDetailView, EquipmentReportView, ReadingStatsView, TrendsView, UploadJobView, register_user, login_user, logout_user
 
 urlpatterns = [
     path('upload/', EquipmentUploadView.as_view(), name='upload'),
+    path('upload/batch/', BatchUploadView.as_view(), name='batch_upload'),
     path('history/<int:pk>/', EquipmentHistoryDetailView.as_view(), name='history_detail'),
+    path('history/<int:pk>/append/', DatasetAppendView.as_view(), name='history_append'),
+    path('history/<int:pk>/report/', EquipmentReportView.as_view(), name='history_report'),
+    path('history/<int:pk>/report/<str:chart>.png', EquipmentReportView.as_view(), name='history_chart'),
+    path('readings/stats/', ReadingStatsView.as_view(), name='reading_stats'),
+    path('trends/', TrendsView.as_view(), name='trends'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('jobs/<uuid:pk>/', UploadJobView.as_view(), name='upload_job'),
     path('register/', register_user, name='register'),
     path('login/', login_user, name='login'),
+    path('logout/', logout_user, name='logout'),
 ]
\ No newline at end of file
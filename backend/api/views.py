@@ -1,17 +1,36 @@
+import asyncio
 import pandas as pd
 import os
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
 from django.contrib.auth import authenticate
 from django.core.files.storage import default_storage
 from django.conf import settings
+from django.db import OperationalError
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
-from .models import EquipmentDataset
-from .serializers import UserSerializer
+from django.urls import reverse
+from .models import EquipmentDataset, UploadJob
+from .datasets import analyzed_page_table, page_frame, page_info, parse_page, check_columns, PageError
+from .append import AppendError, append_rows, csv_columns, read_rows
+from .batch import BatchError, batch_result, discard, match_duplicates, record_batch, retention_warning, save_batch
+from .history import history_page
+from .readings import reading_stats
+from .trends import trends
+from .ingest import analyze_chunk, find_duplicate, ingest_csv, record_dataset, save_upload
+from .renderers import DATASET_RENDERERS, PDFRenderer, PNGRenderer, dataset_response
+from .reports import CHARTS, get_artifact
+from .jobs import schedule_compaction, schedule_readings, submit_upload
+from .metrics import stage
+from .concurrency import AsyncAPIView, run_cpu, run_io
+from .conditional import add_validators, content_etag, dataset_etag, not_modified
+from .serializers import UserSerializer, UploadJobSerializer
 
 # --- Auth Views ---
 @api_view(['POST'])
@@ -35,107 +54,332 @@ def login_user(request):
         return Response({'token': token.key, 'username': user.username}, status=200)
     return Response({'error': 'Invalid Credentials'}, status=401)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout_user(request):
+    """Revoke the caller's token (and its cache entry); the next login issues a new one.
+
+    DRF keeps one token per user, shared by every client that logged in as
+    that user, so this signs out the web app and the desktop client alike.
+    """
+    Token.objects.filter(user=request.user).delete()
+    return Response(status=204)
+
 # --- Equipment Views ---
 
-class EquipmentHistoryDetailView(APIView):
+def open_page(dataset, page):
+    """Page a dataset from its sidecar, re-analyzing the CSV for older uploads.
+
+    Returns (rows, total) where rows is an Arrow table, or a DataFrame on the
+    CSV fallback path.
+    """
+    try:
+        return analyzed_page_table(dataset, page)
+    except FileNotFoundError:
+        file_path = os.path.join(settings.MEDIA_ROOT, dataset.file_name)
+        return page_frame(analyze_chunk(pd.read_csv(file_path)), page)
+
+def record_upload(user, file_name, stats, analyzed_file, content_hash):
+    # One sync call, so the schedule_* on_commit hooks run on the same connection
+    dataset = record_dataset(user, file_name, stats, analyzed_file, content_hash)
+    schedule_readings([dataset.pk])
+    schedule_compaction()
+    return dataset
+
+def record_batch_upload(user, entries):
+    try:
+        datasets = record_batch(user, entries)
+    except Exception:
+        discard(entries)
+        raise
+    schedule_readings([dataset.pk for dataset in datasets])
+    schedule_compaction()
+    return datasets
+
+class EquipmentHistoryDetailView(AsyncAPIView):
     # Only logged in users can access
     permission_classes = [IsAuthenticated]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + DATASET_RENDERERS
 
-    def get(self, request, pk):
+    async def get(self, request, pk):
         """Fetch a specific history item. Ensures user owns it."""
         # This line ensures User A cannot see User B's file
-        dataset = get_object_or_404(EquipmentDataset, pk=pk, user=request.user)
-        
-        file_path = os.path.join(settings.MEDIA_ROOT, dataset.file_name)
+        with stage('orm'):
+            dataset = await sync_to_async(get_object_or_404)(EquipmentDataset, pk=pk, user=request.user)
+
+        # Datasets only change on append: let clients revalidate instead of re-downloading
+        etag = dataset_etag(dataset, request)
+        cached = not_modified(request, etag, dataset.updated_at)
+        if cached:
+            return cached
         
         try:
-            df = pd.read_csv(file_path)
-        except Exception as e:
+            page = parse_page(request.query_params)
+        except PageError as e:
+            return Response({"error": str(e)}, status=400)
+
+        try:
+            with stage('open'):
+                rows, total = await run_cpu(open_page, dataset, page)
+        except PageError as e:
+            return Response({"error": str(e)}, status=400)
+        except Exception:
             # Fallback if file was deleted but DB record exists
             return Response({"error": "File missing from server"}, status=500)
 
-        # Re-run Analysis Logic on load
-        def check_health(row):
-            p = row.get('Pressure', 0)
-            t = row.get('Temperature', 0)
-            if p > 800 and t > 300: return 'CRITICAL'
-            elif p > 600: return 'WARNING'
-            return 'OK'
+        header = {
+            "stats": dataset.summary_stats,
+            "page": page_info(page, total, rows),
+            "history_id": dataset.id
+        }
+        with stage('serialize'):
+            response = await run_cpu(dataset_response, request, header, rows)
+        return add_validators(response, etag, dataset.updated_at)
 
-        if 'Pressure' in df.columns and 'Temperature' in df.columns:
-            df['Status'] = df.apply(check_health, axis=1)
-        else:
-            df['Status'] = 'UNKNOWN'
+class DatasetAppendView(AsyncAPIView):
+    """Append new rows to one of the user's datasets, updating its stats incrementally."""
+    parser_classes = [MultiPartParser]
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request, pk):
+        with stage('orm'):
+            dataset = await sync_to_async(get_object_or_404)(EquipmentDataset, pk=pk, user=request.user)
 
+        files = await run_io(lambda: request.FILES)
+        try:
+            file_obj = files['file']
+        except KeyError:
+            return Response({"error": "No file provided"}, status=400)
+
+        try:
+            columns = await run_io(csv_columns, dataset)
+        except Exception:
+            return Response({"error": "File missing from server"}, status=500)
+
+        # INGEST: Only the new rows are parsed and classified
+        try:
+            with stage('read_csv'):
+                raw, analyzed = await run_cpu(read_rows, file_obj, columns)
+        except AppendError as e:
+            return Response({"error": str(e)}, status=400)
+        except Exception as e:
+            return Response({"error": f"Invalid CSV format: {str(e)}"}, status=400)
+
+        try:
+            dataset = await sync_to_async(append_rows)(dataset.pk, raw, analyzed)
+        except OperationalError:
+            # e.g. SQLite's "database is locked" while another request writes
+            return Response({"error": "The dataset is busy, please retry"}, status=503,
+                            headers={'Retry-After': '1'})
         return Response({
+            "history_id": dataset.id,
+            "appended": len(raw.index),
+            "total_records": dataset.total_records,
             "stats": dataset.summary_stats,
-            "data": df.fillna('').to_dict(orient='records'),
-            "history_id": dataset.id
         })
 
-class EquipmentUploadView(APIView):
+class EquipmentReportView(APIView):
+    """Server-rendered PDF report, or one of its chart PNGs, for a history item."""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [PDFRenderer, PNGRenderer] + api_settings.DEFAULT_RENDERER_CLASSES
+
+    def get(self, request, pk, chart=None):
+        dataset = get_object_or_404(EquipmentDataset, pk=pk, user=request.user)
+        if chart is not None and chart not in CHARTS:
+            raise Http404(f"Unknown chart: {chart}")
+
+        etag = dataset_etag(dataset, request)
+        cached = not_modified(request, etag, dataset.updated_at)
+        if cached:
+            return cached
+
+        try:
+            content = get_artifact(dataset, chart or 'pdf')
+        except Exception:
+            return Response({"error": "File missing from server"}, status=500)
+
+        if chart:
+            response = HttpResponse(content, content_type='image/png')
+        else:
+            response = HttpResponse(content, content_type='application/pdf')
+            name = os.path.splitext(os.path.basename(dataset.file_name))[0]
+            response['Content-Disposition'] = f'inline; filename="{name}_report.pdf"'
+        return add_validators(response, etag, dataset.updated_at)
+
+class EquipmentUploadView(AsyncAPIView):
     parser_classes = [MultiPartParser]
     permission_classes = [IsAuthenticated] # CRITICAL: Enforces 403 if not logged in
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + DATASET_RENDERERS
 
-    def get(self, request):
-        """Fetch history list ONLY for the current user."""
-        # Filter: user=request.user
-        history = EquipmentDataset.objects.filter(user=request.user).order_by('-uploaded_at')[:5]
-        return Response({
-            "history": list(history.values('id', 'file_name', 'uploaded_at', 'total_records'))
-        })
+    async def get(self, request):
+        """Fetch history list ONLY for the current user, newest first.
+
+        ``?limit=`` sets the page size and ``?cursor=`` continues from the
+        ``next`` cursor of the previous page.
+        """
+        try:
+            with stage('orm'):
+                history, next_cursor = await sync_to_async(history_page)(request.user, request.query_params)
+        except PageError as e:
+            return Response({"error": str(e)}, status=400)
+        payload = {"history": history, "next": next_cursor}
 
-    def post(self, request):
+        # The list only changes on upload, so polls usually end in a 304
+        etag = content_etag(payload, request)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        return add_validators(Response(payload), etag)
+
+    async def post(self, request):
+        # Parsing the multipart body spools the upload to disk
+        files = await run_io(lambda: request.FILES)
         try:
-            file_obj = request.FILES['file']
+            file_obj = files['file']
         except KeyError:
             return Response({"error": "No file provided"}, status=400)
 
-        file_name = default_storage.save(file_obj.name, file_obj)
+        try:
+            page = parse_page(request.query_params)
+        except PageError as e:
+            return Response({"error": str(e)}, status=400)
+
+        # SAVE: Stream to MEDIA_ROOT, hashing the content on the way
+        with stage('save'):
+            file_name, content_hash = await run_io(save_upload, file_obj)
         file_path = os.path.join(settings.MEDIA_ROOT, file_name)
 
-        try:
-            df = pd.read_csv(file_path)
-        except Exception as e:
-            return Response({"error": f"Invalid CSV format: {str(e)}"}, status=400)
+        # DEDUP: An identical earlier upload already has stats and a sidecar
+        with stage('dedup'):
+            duplicate = await sync_to_async(find_duplicate)(request.user, content_hash)
+        if duplicate:
+            await run_io(default_storage.delete, file_name)
 
-        # Analysis Logic
-        def check_health(row):
-            p = row.get('Pressure', 0)
-            t = row.get('Temperature', 0)
-            if p > 800 and t > 300: return 'CRITICAL'
-            elif p > 600: return 'WARNING'
-            return 'OK'
+        # ASYNC: Analyze in the background; poll /api/jobs/<id>/ for the result
+        if request.query_params.get('async') in ('1', 'true'):
+            job = await sync_to_async(submit_upload)(request.user, file_name, content_hash, duplicate=duplicate)
+            status_url = reverse('upload_job', kwargs={'pk': job.pk})
+            return Response(UploadJobSerializer(job).data, status=202, headers={'Location': status_url})
 
-        if 'Pressure' in df.columns and 'Temperature' in df.columns:
-            df['Status'] = df.apply(check_health, axis=1)
-        else:
-            df['Status'] = 'UNKNOWN'
+        dataset = duplicate
+        if dataset is None:
+            # INGEST: Parse, classify and aggregate in bounded-size chunks
+            try:
+                stats, analyzed_file, columns = await run_cpu(ingest_csv, file_path, file_name)
+            except Exception as e:
+                return Response({"error": f"Invalid CSV format: {str(e)}"}, status=400)
+
+            try:
+                check_columns(page, columns)
+            except PageError as e:
+                return Response({"error": str(e)}, status=400)
+
+            # RECORD: Attach the logged-in user to this record
+            dataset = await sync_to_async(record_upload)(request.user, file_name, stats, analyzed_file, content_hash)
 
-        stats = {
-            "total_count": int(len(df)),
-            "avg_pressure": round(df['Pressure'].mean(), 2) if 'Pressure' in df else 0,
-            "avg_temp": round(df['Temperature'].mean(), 2) if 'Temperature' in df else 0,
-            "type_distribution": df['Type'].value_counts().to_dict() if 'Type' in df else {}
+        # RETURN: Updated history for THIS user
+        with stage('orm'):
+            history, _ = await sync_to_async(history_page)(request.user)
+
+        try:
+            with stage('open'):
+                rows, total = await run_cpu(open_page, dataset, page)
+        except PageError as e:
+            return Response({"error": str(e)}, status=400)
+
+        header = {
+            "stats": dataset.summary_stats,
+            "page": page_info(page, total, rows),
+            "history": history,
+            "history_id": dataset.id,
+            "deduplicated": duplicate is not None
         }
+        with stage('serialize'):
+            return await run_cpu(dataset_response, request, header, rows)
+
+class BatchUploadView(AsyncAPIView):
+    """Several CSVs, or ZIP archives of CSVs, analyzed and recorded in one request."""
+    parser_classes = [MultiPartParser]
+    permission_classes = [IsAuthenticated]
 
-        # SAVE: Attach the logged-in user to this record
-        EquipmentDataset.objects.create(
-            user=request.user,
-            file_name=file_name,
-            total_records=stats['total_count'],
-            summary_stats=stats
+    async def post(self, request):
+        files = await run_io(lambda: request.FILES.getlist('files'))
+        if not files:
+            return Response({"error": "No files provided"}, status=400)
+
+        # SAVE: Every CSV is stored and hashed like a single upload
+        try:
+            with stage('save'):
+                entries = await run_io(save_batch, files)
+        except BatchError as e:
+            return Response({"error": str(e)}, status=400)
+
+        with stage('dedup'):
+            await sync_to_async(match_duplicates)(request.user, [e for e in entries if 'file_name' in e])
+
+        # INGEST: New files are analyzed concurrently on the analysis pool
+        pending = [e for e in entries if 'file_name' in e]
+        results = await asyncio.gather(
+            *(run_cpu(ingest_csv, os.path.join(settings.MEDIA_ROOT, e['file_name']), e['file_name'])
+              for e in pending),
+            return_exceptions=True,
         )
-        
-        # CLEANUP: Keep only last 5 for THIS user
-        ids_to_keep = EquipmentDataset.objects.filter(user=request.user).order_by('-uploaded_at')[:5].values_list('id', flat=True)
-        EquipmentDataset.objects.filter(user=request.user).exclude(id__in=ids_to_keep).delete()
+        for entry, result in zip(pending, results):
+            if isinstance(result, Exception):
+                discard([entry])
+                entry['error'] = f"Invalid CSV format: {str(result)}"
+            else:
+                entry['stats'], entry['analyzed_file'], _ = result
 
-        # RETURN: Updated history for THIS user
-        history = EquipmentDataset.objects.filter(user=request.user).order_by('-uploaded_at')[:5]
+        # RECORD: All new datasets in one statement
+        analyzed = [e for e in entries if 'stats' in e]
+        datasets = []
+        if analyzed:
+            datasets = await sync_to_async(record_batch_upload)(request.user, analyzed)
+            for entry, dataset in zip(analyzed, datasets):
+                entry['dataset'] = dataset
 
-        return Response({
-            "stats": stats,
-            "data": df.fillna('').to_dict(orient='records'),
-            "history": list(history.values('id', 'file_name', 'uploaded_at', 'total_records'))
-        })
\ No newline at end of file
+        with stage('orm'):
+            history, _ = await sync_to_async(history_page)(request.user)
+        files = [batch_result(entry) for entry in entries]
+        status = 200 if any('history_id' in f for f in files) else 400
+        payload = {"files": files, "history": history}
+        warning = retention_warning(datasets)
+        if warning:
+            payload["warning"] = warning
+        return Response(payload, status=status)
+
+class UploadJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        """Report progress of an async upload owned by the current user."""
+        job = get_object_or_404(UploadJob, pk=pk, user=request.user)
+        return Response(UploadJobSerializer(job).data)
+
+class ReadingStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Per-type/equipment/status/dataset aggregates over the user's readings, in SQL."""
+        try:
+            groups = reading_stats(request.user, request.query_params)
+        except PageError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response({"group_by": request.query_params.get('group_by') or 'type', "groups": groups})
+
+class TrendsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """How a metric evolved across the user's uploads, from stored aggregates only."""
+        try:
+            payload = trends(request.user, request.query_params)
+        except PageError as e:
+            return Response({"error": str(e)}, status=400)
+
+        etag = content_etag(payload, request)
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        return add_validators(Response(payload), etag)
@@ -27,9 +27,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.TimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.concurrency.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -63,6 +64,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Transactions take the write lock up front, so concurrent writers
+        # (uploads, appends, background reading fills) queue for up to
+        # `timeout` seconds instead of failing with "database is locked"
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
@@ -98,7 +103,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 # 3. DRF Authentication Settings (THE FIX FOR 403 ERRORS)
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -107,4 +112,65 @@ REST_FRAMEWORK = {
 }
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
\ No newline at end of file
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+# 4. Equipment Health Thresholds
+# Keys are equipment Types (or 'default'); values override critical_pressure,
+# critical_temp and warning_pressure from api.health.DEFAULT_THRESHOLDS.
+EQUIPMENT_HEALTH_THRESHOLDS = {}
+
+# 5. Upload Ingestion
+# Rows parsed per chunk; bounds upload memory independently of file size.
+UPLOAD_CHUNK_ROWS = 50_000
+
+# 6. Async Upload Jobs
+# Threads analyzing uploads sent with ?async=1; 0 runs jobs inline.
+UPLOAD_JOB_WORKERS = 2
+
+# 7. Server-side Reports
+# Seconds a rendered report/chart stays in the default cache. Artifacts are
+# keyed by dataset version, so this only bounds cache memory, not staleness.
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# 8. History & Retention
+# Datasets kept per user (older ones are pruned by media compaction; None
+# keeps all), and the default page size of the history listing.
+DATASET_RETENTION = 5
+HISTORY_PAGE_SIZE = 5
+
+# 9. Media Compaction
+# Seconds between background compactions triggered by uploads (0 disables;
+# `manage.py compact_media` still works), and how long a fresh unreferenced
+# file is left alone in case its upload is still being ingested.
+MEDIA_COMPACT_INTERVAL = 60 * 60
+MEDIA_COMPACT_GRACE = 60 * 60
+
+# 10. Request Metrics
+# Per-stage Server-Timing headers and latency histograms at /api/metrics/,
+# which only answers the listed client addresses.
+REQUEST_METRICS = True
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# 11. Caches & Token Authentication
+# Tokens get their own cache so large report artifacts never evict them.
+# Swap in a shared backend (Redis, Memcached) to share entries across workers.
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth-tokens'},
+}
+AUTH_TOKEN_CACHE = 'auth'
+# LocMem is per process: logout only evicts the token in the worker that
+# served it, so other workers accept it until this TTL runs out. Keep it short
+# unless AUTH_TOKEN_CACHE is a shared backend.
+AUTH_TOKEN_CACHE_TTL = 30
+
+# 12. Async Views
+# Threads running CSV parsing/analysis and page serialization for the async
+# upload and history views; 0 runs them inline on the event loop.
+ANALYSIS_WORKERS = min(4, os.cpu_count() or 1)
+
+# 13. Batch Uploads
+# Most CSV files (after expanding ZIP archives) and uncompressed bytes one
+# POST /api/upload/batch/ may carry.
+BATCH_MAX_FILES = 100
+BATCH_MAX_BYTES = 2 * 1024 ** 3
@@ -1,14 +1,22 @@
 import sys
+import io
+import json
+import uuid
+import hashlib
+from urllib.parse import urlencode
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
-import tempfile
 import os
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QFileDialog, 
-                             QTableWidget, QTableWidgetItem, QHeaderView, 
-                             QMessageBox, QLineEdit, QFrame, QScrollArea)
-from PyQt5.QtCore import Qt, pyqtSignal
+                             QHeaderView, 
+                             QMessageBox, QLineEdit, QFrame, QScrollArea, QProgressDialog,
+                             QTableView, QComboBox)
+from PyQt5.QtCore import (Qt, pyqtSignal, QObject, QRunnable, QThreadPool,
+                          QAbstractTableModel, QModelIndex)
 from PyQt5.QtGui import QColor
 
 import matplotlib.pyplot as plt
@@ -20,8 +28,612 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
 
+# Optional: columnar Arrow transport (falls back to JSON records without it)
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
 # Configuration
 API_BASE = "http://127.0.0.1:8000/api"
+REQUEST_TIMEOUT = (5, 300) # connect, read (seconds)
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+DATASET_ACCEPT = ARROW_STREAM if pa else "application/json"
+
+GRID_PAGE_ROWS = 5000 # rows per lazily fetched grid page
+CHART_MAX_BARS = 30 # per-record bars up to this many rows, aggregated beyond
+
+# Grid columns, with the lowercase keys older payloads used
+GRID_COLUMNS = [('Equipment Name', 'name'), ('Type', 'type'), ('Pressure', 'pressure'),
+                ('Temperature', 'temp'), ('Status', None)]
+
+def decode_response(res):
+    """Decode a JSON or Arrow-stream response into a dict.
+
+    Arrow payloads carry the JSON header in the schema metadata; the rows are
+    returned as a DataFrame under 'frame' instead of a 'data' record list.
+    """
+    if pa and res.headers.get('Content-Type', '').startswith(ARROW_STREAM):
+        table = pa.ipc.open_stream(res.content).read_all()
+        payload = json.loads(table.schema.metadata[b'chemvis.header'])
+        payload['frame'] = table.to_pandas()
+        return payload
+    return res.json()
+
+def decode_with_status(res):
+    """Worker-side decode: (status, etag, payload); dataset rows become a DataFrame."""
+    payload = None
+    if res.status_code == 200:
+        payload = decode_response(res)
+        if 'data' in payload:
+            payload['frame'] = pd.DataFrame(payload.pop('data'))
+    return res.status_code, res.headers.get('ETag'), payload
+
+def dataset_frame(payload):
+    return payload.get('frame', pd.DataFrame())
+
+def grid_frame(df):
+    """Project a dataset frame onto the five grid columns."""
+    grid = pd.DataFrame(index=df.index)
+    for col, legacy in GRID_COLUMNS:
+        if col in df.columns:
+            grid[col] = df[col]
+        elif legacy and legacy in df.columns:
+            grid[col] = df[legacy]
+        else:
+            grid[col] = 'UNKNOWN' if col == 'Status' else ''
+    return grid
+
+def cell_text(value):
+    if pd.isna(value):
+        return ''
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+# --- Local Dataset Cache ---
+# Datasets rarely change once uploaded, so the first grid page of each one is
+# kept on disk as an Arrow file named after its history_id. A cached dataset
+# opens instantly (and during brief outages); a conditional GET then confirms
+# it in the background, or replaces it once rows were appended. Least recently
+# used files are evicted once the cache exceeds CACHE_MAX_BYTES.
+
+CACHE_DIR = os.environ.get('CHEMVIS_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.chemvis', 'cache')
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+CACHE_META_KEY = b'chemvis.cache'
+
+class DatasetCache:
+    """On-disk LRU of decoded dataset payloads; disabled without pyarrow."""
+    def __init__(self, root, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def for_user(cls, username):
+        # One directory per server and account, so users never share entries
+        key = hashlib.sha256(f"{API_BASE}|{username}".encode('utf-8')).hexdigest()[:16]
+        return cls(os.path.join(CACHE_DIR, key))
+
+    def path(self, history_id):
+        return os.path.join(self.root, f"{int(history_id)}.arrow")
+
+    def get(self, history_id):
+        """Return (etag, payload) for a cached dataset, or None."""
+        if not pa:
+            return None
+        path = self.path(history_id)
+        try:
+            with open(path, 'rb') as f:
+                table = pa.ipc.open_file(f).read_all()
+            meta = json.loads(table.schema.metadata[CACHE_META_KEY])
+            os.utime(path) # mtime doubles as the LRU clock
+        except (OSError, KeyError, ValueError, pa.ArrowException):
+            return None
+        payload = meta['payload']
+        payload['frame'] = table.to_pandas()
+        return meta.get('etag'), payload
+
+    def put(self, history_id, etag, payload):
+        if not pa or history_id is None:
+            return
+        path = self.path(history_id)
+        tmp = path + '.tmp'
+        header = {k: v for k, v in payload.items() if k not in ('frame', 'history')}
+        try:
+            table = pa.Table.from_pandas(dataset_frame(payload), preserve_index=False)
+            meta = dict(table.schema.metadata or {})
+            meta[CACHE_META_KEY] = json.dumps({'etag': etag, 'payload': header})
+            table = table.replace_schema_metadata(meta)
+            os.makedirs(self.root, exist_ok=True)
+            with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path) # readers never see a half-written entry
+        except (OSError, TypeError, ValueError, pa.ArrowException):
+            self._remove(tmp)
+            return
+        self.trim()
+
+    def discard(self, history_id):
+        self._remove(self.path(history_id))
+
+    def trim(self):
+        """Evict least recently used entries until the budget is met."""
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith('.arrow'):
+                st = os.stat(os.path.join(self.root, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(os.path.join(self.root, name))
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+# --- Chart Pipeline ---
+# Bars are reduced to at most CHART_MAX_BARS before plotting, so redraw cost is
+# bounded no matter how many rows the dataset has.
+
+def chart_series(grid, max_bars=CHART_MAX_BARS):
+    """Reduce grid rows to at most ``max_bars`` (labels, pressure, temp) bars.
+
+    Small datasets keep one bar pair per record. Larger ones are averaged per
+    Type (the ``max_bars`` most common), or in equal row bins when no row has
+    a Type.
+    """
+    pressure = pd.to_numeric(grid['Pressure'], errors='coerce')
+    temp = pd.to_numeric(grid['Temperature'], errors='coerce')
+    if len(grid) <= max_bars:
+        labels = grid['Equipment Name'].map(cell_text).tolist()
+        return labels, pressure.fillna(0).to_numpy(), temp.fillna(0).to_numpy()
+
+    frame = pd.DataFrame({'Pressure': pressure.to_numpy(), 'Temperature': temp.to_numpy()})
+    types = grid['Type'].map(cell_text).to_numpy()
+    if (types != '').any():
+        keys = np.where(types == '', 'Unknown', types)
+        grouped = frame.groupby(keys)
+        counts = grouped.size().nlargest(max_bars)
+        means = grouped.mean().loc[counts.index]
+        labels = [f"{name} (n={count})" for name, count in counts.items()]
+    else:
+        positions = np.arange(len(frame))
+        bins = positions * max_bars // len(frame)
+        means = frame.groupby(bins).mean()
+        starts = pd.Series(positions).groupby(bins).agg(['min', 'max'])
+        labels = [f"#{lo + 1}-{hi + 1}" for lo, hi in starts.itertuples(index=False)]
+    return labels, means['Pressure'].fillna(0).to_numpy(), means['Temperature'].fillna(0).to_numpy()
+
+# --- Data Grid Model ---
+# The grid is a QTableView over column arrays: nothing is created per cell, and
+# Qt only asks for the cells currently on screen. Rows arrive page by page via
+# Qt's canFetchMore/fetchMore as the user scrolls towards the end.
+
+STATUS_COLORS = {
+    'CRITICAL': ("#fadbd8", "#c0392b"),
+    'WARNING': ("#fdebd0", "#d35400"),
+}
+OK_COLORS = ("#d4efdf", "#27ae60")
+
+class DatasetTableModel(QAbstractTableModel):
+    HEADERS = ["Name", "Type", "Pressure", "Temp", "Status"]
+    STATUS_COL = 4
+    NUMERIC_COLS = (2, 3)
+
+    def __init__(self, fetch_page=None, parent=None):
+        """``fetch_page(offset, limit, sort)`` requests more rows; the caller
+        answers with append() or fetch_failed()."""
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.columns = [np.empty(0, dtype=object) for _ in self.HEADERS]
+        self.order = np.empty(0, dtype=np.int64) # visible row -> loaded row
+        self.total = 0
+        self.fetching = False
+        self.sort_key = None # (column, descending)
+        self.server_sort = None # sort param sent with page requests
+        self.status_filter = None
+        self.generation = 0 # bumped whenever in-flight pages become stale
+
+    @property
+    def loaded(self):
+        return len(self.columns[0])
+
+    def _arrays(self, df):
+        grid = grid_frame(df)
+        arrays = []
+        for i, col in enumerate(grid.columns):
+            if i in self.NUMERIC_COLS:
+                arrays.append(pd.to_numeric(grid[col], errors='coerce').to_numpy(dtype=float))
+            else:
+                arrays.append(grid[col].to_numpy(dtype=object))
+        return arrays
+
+    def reset(self, df, total=None):
+        """Show a new dataset whose first page is ``df``."""
+        self.beginResetModel()
+        self.generation += 1
+        self.columns = self._arrays(df)
+        self.total = max(total or 0, self.loaded)
+        self.fetching = False
+        self.sort_key = None
+        self.server_sort = None
+        self.order = self._visible(np.arange(self.loaded))
+        self.endResetModel()
+
+    def append(self, df):
+        """Add a fetched page to the end of the loaded rows."""
+        self.fetching = False
+        if df.empty:
+            self.total = self.loaded # server has nothing more
+            return
+        start = self.loaded
+        self.columns = [np.concatenate([old, new]) for old, new in zip(self.columns, self._arrays(df))]
+        new_rows = self._visible(np.arange(start, self.loaded))
+        if len(new_rows):
+            first = len(self.order)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+            self.order = np.concatenate([self.order, new_rows])
+            self.endInsertRows()
+
+    def fetch_failed(self):
+        self.fetching = False
+
+    def loaded_frame(self):
+        """Loaded rows (in load order) as a grid-shaped DataFrame."""
+        return pd.DataFrame({col: arr for col, arr in zip([c for c, _ in GRID_COLUMNS], self.columns)})
+
+    def _visible(self, rows):
+        if self.status_filter:
+            rows = rows[self.columns[self.STATUS_COL][rows] == self.status_filter]
+        return rows
+
+    def _rebuild(self):
+        self.beginResetModel()
+        rows = np.arange(self.loaded)
+        if self.sort_key and self.server_sort is None:
+            col, descending = self.sort_key
+            keys = pd.Series(self.columns[col])
+            if col not in self.NUMERIC_COLS:
+                keys = keys.map(cell_text)
+            rows = keys.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+        self.order = self._visible(rows)
+        self.endResetModel()
+
+    def set_status_filter(self, status):
+        self.status_filter = status or None
+        self._rebuild()
+
+    # --- QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        col = index.column()
+        value = self.columns[col][self.order[index.row()]]
+        if role == Qt.DisplayRole:
+            return cell_text(value)
+        if col != self.STATUS_COL:
+            return None
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role in (Qt.BackgroundRole, Qt.ForegroundRole):
+            background, foreground = STATUS_COLORS.get(value, OK_COLORS)
+            return QColor(background if role == Qt.BackgroundRole else foreground)
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        if column < 0:
+            return
+        descending = order == Qt.DescendingOrder
+        self.sort_key = (column, descending)
+        if self.loaded < self.total and self.fetch_page:
+            # Only part of the dataset is here: let the server sort, then refill
+            source = GRID_COLUMNS[column][0]
+            self.server_sort = ('-' if descending else '') + source
+            self.generation += 1
+            self.beginResetModel()
+            self.columns = [arr[:0] for arr in self.columns]
+            self.order = np.empty(0, dtype=np.int64)
+            self.fetching = False
+            self.endResetModel()
+            self.fetchMore(QModelIndex())
+            return
+        self.server_sort = None
+        self._rebuild()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return (not parent.isValid() and self.fetch_page is not None
+                and not self.fetching and self.loaded < self.total)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.fetching = True
+        self.fetch_page(self.loaded, GRID_PAGE_ROWS, self.server_sort)
+
+# --- Network Layer ---
+# All HTTP runs on a QThreadPool so the GUI thread never blocks. Requests share
+# one pooled requests.Session (keep-alive, no per-call TCP handshake) and
+# report back through Qt signals, which are delivered on the GUI thread.
+
+class RequestCancelled(Exception):
+    pass
+
+class MultipartFile:
+    """multipart/form-data body streamed from disk, one part per file.
+
+    Exposes read()/__len__ so requests sends it with a Content-Length while
+    reading it in blocks, which lets us report progress and abort mid-upload.
+    """
+    def __init__(self, paths, field='file', on_read=None, is_cancelled=None):
+        paths = [paths] if isinstance(paths, str) else list(paths)
+        boundary = uuid.uuid4().hex
+        self.parts = []
+        self.total = 0
+        for i, path in enumerate(paths):
+            name = os.path.basename(path).replace('"', '')
+            content_type = 'application/zip' if name.lower().endswith('.zip') else 'text/csv'
+            # Every part after the first starts by closing the previous file's data
+            head = (('\r\n' if i else '') + f'--{boundary}\r\n'
+                    f'Content-Disposition: form-data; name="{field}"; filename="{name}"\r\n'
+                    f'Content-Type: {content_type}\r\n\r\n').encode()
+            self.parts += [io.BytesIO(head), open(path, 'rb')]
+            self.total += len(head) + os.path.getsize(path)
+        tail = f'\r\n--{boundary}--\r\n'.encode()
+        self.parts.append(io.BytesIO(tail))
+        self.total += len(tail)
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        self.sent = 0
+        self.reported = -1
+        self.on_read = on_read
+        self.is_cancelled = is_cancelled
+
+    def __len__(self):
+        return self.total
+
+    def read(self, size=-1):
+        if self.is_cancelled and self.is_cancelled():
+            raise RequestCancelled()
+        chunk = b''
+        while self.parts and (size < 0 or len(chunk) < size):
+            data = self.parts[0].read(-1 if size < 0 else size - len(chunk))
+            if not data:
+                self.parts.pop(0).close()
+                continue
+            chunk += data
+        self.sent += len(chunk)
+        # Report at most once per percent to avoid flooding the GUI event queue
+        percent = self.sent * 100 // self.total
+        if self.on_read and percent != self.reported:
+            self.reported = percent
+            self.on_read(self.sent, self.total)
+        return chunk
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+        self.parts = []
+
+class RequestSignals(QObject):
+    finished = pyqtSignal(object) # decoded result
+    failed = pyqtSignal(str)
+    progress = pyqtSignal(int, int) # bytes sent, total
+    done = pyqtSignal() # always emitted last, even when cancelled
+
+class RequestTask(QRunnable):
+    """One HTTP call run on the pool; ``decode`` also runs off the GUI thread."""
+    def __init__(self, session, method, url, decode=None, upload_path=None, upload_field='file', **kwargs):
+        super().__init__()
+        self.session = session
+        self.method = method
+        self.url = url
+        self.decode = decode
+        self.upload_path = upload_path
+        self.upload_field = upload_field
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.signals = RequestSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            self.execute()
+        finally:
+            self.signals.done.emit()
+
+    def execute(self):
+        body = None
+        try:
+            if self.upload_path:
+                body = MultipartFile(self.upload_path, self.upload_field, on_read=self.signals.progress.emit,
+                                     is_cancelled=lambda: self.cancelled)
+                headers = dict(self.kwargs.pop('headers', {}) or {})
+                headers['Content-Type'] = body.content_type
+                self.kwargs.update(data=body, headers=headers)
+            res = self.session.request(self.method, self.url, timeout=REQUEST_TIMEOUT, **self.kwargs)
+            result = self.decode(res) if self.decode else res
+        except RequestCancelled:
+            return
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(str(e))
+            return
+        finally:
+            if body:
+                body.close()
+        if not self.cancelled:
+            self.signals.finished.emit(result)
+
+class ApiClient:
+    """Shared pooled session plus thread pool for every window."""
+    def __init__(self, max_threads=4):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_threads)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = set() # keep tasks (and their signals) alive until they report
+
+    def set_token(self, token):
+        if token:
+            self.session.headers['Authorization'] = f'Token {token}'
+        else:
+            self.session.headers.pop('Authorization', None)
+
+    def request(self, method, path, on_done, on_error=None, on_progress=None, **kwargs):
+        task = RequestTask(self.session, method, f"{API_BASE}/{path}", **kwargs)
+        task.setAutoDelete(False)
+
+        task.signals.finished.connect(on_done)
+        if on_error:
+            task.signals.failed.connect(on_error)
+        task.signals.done.connect(lambda: self.tasks.discard(task))
+        if on_progress:
+            task.signals.progress.connect(on_progress)
+
+        self.tasks.add(task)
+        self.pool.start(task)
+        return task
+
+    def get(self, path, on_done, **kwargs):
+        return self.request('GET', path, on_done, **kwargs)
+
+    def post(self, path, on_done, **kwargs):
+        return self.request('POST', path, on_done, **kwargs)
+
+api = None # ApiClient, created once the QApplication exists
+
+# --- PDF Reports ---
+# Reports are built on the pool, away from the GUI thread. Charts are passed in
+# as in-memory PNGs and the data table is split into PDF_TABLE_ROWS-row tables
+# that repeat their header row across page breaks.
+
+PDF_TABLE_ROWS = 500 # rows per reportlab Table
+PDF_SUMMARY_ROWS = 20_000 # above this, offer a summary-only report
+PDF_HEADER = ["Name", "Type", "Pressure", "Temp", "Status"]
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+def chart_png(canvas):
+    """Render a chart canvas to PNG bytes (call on the GUI thread)."""
+    buf = io.BytesIO()
+    canvas.figure.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+class ReportSignals(QObject):
+    finished = pyqtSignal(str) # saved path
+    failed = pyqtSignal(str)
+    progress = pyqtSignal(int, int) # flowables laid out, total
+
+class ReportTask(QRunnable):
+    """Builds one PDF report on the pool; ``frame`` None means summary only."""
+    def __init__(self, path, username, stats, charts, frame=None, total_rows=0):
+        super().__init__()
+        self.path = path
+        self.username = username
+        self.stats = stats
+        self.charts = charts # PNG bytes per chart
+        self.frame = frame
+        self.total_rows = total_rows
+        self.cancelled = False
+        self.size = 0
+        self.signals = ReportSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            doc = SimpleDocTemplate(self.path, pagesize=letter)
+            doc.setProgressCallBack(self.on_build_progress)
+            doc.build(self.elements())
+        except RequestCancelled:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(str(e))
+            return
+        if not self.cancelled:
+            self.signals.finished.emit(self.path)
+
+    def on_build_progress(self, kind, value):
+        if self.cancelled:
+            raise RequestCancelled()
+        if kind == 'SIZE_EST':
+            self.size = value
+        elif kind == 'PROGRESS':
+            self.signals.progress.emit(min(value, self.size), self.size)
+
+    def elements(self):
+        styles = getSampleStyleSheet()
+        elements = [
+            Paragraph("Chemical Equipment Report", styles['Title']),
+            Spacer(1, 12),
+            Paragraph(f"Generated by: {self.username} on {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']),
+            Spacer(1, 20),
+        ]
+
+        # Charts side by side, straight from memory
+        images = [Image(io.BytesIO(png), width=250, height=200) for png in self.charts]
+        elements += [Table([images]), Spacer(1, 20)]
+
+        # Summary
+        summary = [
+            ["Total records", f"{self.stats.get('total_count', self.total_rows):,}"],
+            ["Avg pressure", cell_text(self.stats.get('avg_pressure', 0))],
+            ["Avg temperature", cell_text(self.stats.get('avg_temp', 0))],
+        ]
+        summary += [[f"Type: {name}", f"{count:,}"]
+                    for name, count in self.stats.get('type_distribution', {}).items()]
+        elements += [Paragraph("Summary", styles['Heading2']),
+                     Table(summary, hAlign='LEFT', style=[('GRID', (0, 0), (-1, -1), 0.5, colors.grey)]),
+                     Spacer(1, 20)]
+
+        if self.frame is None:
+            elements.append(Paragraph(f"Summary-only report: the {self.total_rows:,} data rows are omitted.", styles['Italic']))
+            return elements
+
+        # Data table in PDF_TABLE_ROWS chunks so no single Table holds every row
+        elements.append(Paragraph("Data", styles['Heading2']))
+        if len(self.frame) < self.total_rows:
+            elements.append(Paragraph(f"First {len(self.frame):,} of {self.total_rows:,} rows (as loaded).", styles['Italic']))
+        for start in range(0, len(self.frame), PDF_TABLE_ROWS):
+            if self.cancelled:
+                raise RequestCancelled()
+            chunk = self.frame.iloc[start:start + PDF_TABLE_ROWS]
+            data = [PDF_HEADER] + [[cell_text(v) for v in row] for row in chunk.itertuples(index=False)]
+            elements.append(Table(data, repeatRows=1, style=PDF_TABLE_STYLE))
+        return elements
 
 # --- Styles ---
 STYLES = """
@@ -45,7 +657,7 @@ STYLES = """
     QPushButton#SuccessBtn { background-color: #27ae60; color: white; border: none; padding: 10px; border-radius: 4px; font-weight: bold; }
     QPushButton#SuccessBtn:hover { background-color: #219150; }
     
-    QTableWidget { border: 1px solid #ddd; background-color: white; gridline-color: #eee; }
+    QTableView { border: 1px solid #ddd; background-color: white; gridline-color: #eee; }
     QHeaderView::section { background-color: #f8f9fa; padding: 8px; border: none; font-weight: bold; color: #555; }
     
     /* History Button Style */
@@ -71,6 +683,52 @@ class MplCanvas(FigureCanvas):
         super(MplCanvas, self).__init__(self.fig)
         self.fig.tight_layout()
 
+class BarChart(MplCanvas):
+    """Grouped Pressure/Temp bars that reuses its artists between updates."""
+    WIDTH = 0.35
+
+    def __init__(self, parent=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.bars = None # (pressure, temp) BarContainers
+
+    def plot(self, labels, pressure, temp):
+        x = np.arange(len(labels))
+        if self.bars is not None and len(self.bars[0]) == len(labels):
+            # Same bar count: just move the existing rectangles
+            for bars, heights in zip(self.bars, (pressure, temp)):
+                for rect, height in zip(bars, heights):
+                    rect.set_height(height)
+        else:
+            if self.bars is not None:
+                for bars in self.bars:
+                    bars.remove()
+            self.bars = (
+                self.axes.bar(x - self.WIDTH / 2, pressure, self.WIDTH, label='Press', color='#36A2EB'),
+                self.axes.bar(x + self.WIDTH / 2, temp, self.WIDTH, label='Temp', color='#FF6384'),
+            )
+            if self.axes.get_legend() is None:
+                self.axes.legend()
+            self.axes.set_xticks(x)
+        self.axes.set_xticklabels(labels, rotation=45, ha='right')
+        self.axes.relim()
+        self.axes.autoscale_view()
+        self.draw_idle()
+
+class PieChart(MplCanvas):
+    """Type distribution pie, redrawn only when the distribution changes."""
+    def __init__(self, parent=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.dist = None
+
+    def plot(self, dist):
+        if dist == self.dist:
+            return
+        self.dist = dict(dist)
+        self.axes.cla()
+        if dist:
+            self.axes.pie(dist.values(), labels=dist.keys(), autopct='%1.1f%%')
+        self.draw_idle()
+
 class LoginWindow(QWidget):
     success_signal = pyqtSignal(str, str) # token, username
 
@@ -143,8 +801,13 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, "Error", "Please enter both credentials")
             return
         endpoint = "register/" if self.is_registering else "login/"
+        self.btn_action.setEnabled(False)
+        api.post(endpoint, self.on_auth_response, on_error=self.on_auth_error,
+                 json={"username": username, "password": password})
+
+    def on_auth_response(self, response):
+        self.btn_action.setEnabled(True)
         try:
-            response = requests.post(f"{API_BASE}/{endpoint}", json={"username": username, "password": password})
             if response.status_code == 200:
                 data = response.json()
                 self.success_signal.emit(data['token'], data['username'])
@@ -155,12 +818,23 @@ class LoginWindow(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Connection Error", str(e))
 
+    def on_auth_error(self, message):
+        self.btn_action.setEnabled(True)
+        QMessageBox.critical(self, "Connection Error", message)
+
 class DashboardWindow(QMainWindow):
     def __init__(self, token, username):
         super().__init__()
         self.token = token
         self.username = username
-        self.current_data = [] # Store data for PDF generation
+        self.current_data = pd.DataFrame() # Store data for PDF generation
+        self.http_cache = {} # path -> (etag, payload) for conditional GETs
+        self.dataset_cache = DatasetCache.for_user(username)
+        self.pending_load = None # in-flight history load, cancelled by a newer click
+        self.current_id = None # dataset shown in the grid, for lazy page fetches
+        self.tasks_in_flight = [] # uploads to cancel on logout
+        self.report_task = None # PDF report being built, if any
+        self.current_stats = {}
         
         self.setWindowTitle("ChemVis Pro - Desktop Dashboard")
         self.setGeometry(100, 100, 1400, 900)
@@ -256,14 +930,14 @@ class DashboardWindow(QMainWindow):
         bar_f = QFrame(objectName="Card")
         bl = QVBoxLayout(bar_f)
         bl.addWidget(QLabel("Pressure vs Temp"))
-        self.cv_bar = MplCanvas(self)
+        self.cv_bar = BarChart(self)
         bl.addWidget(self.cv_bar)
         chart_row.addWidget(bar_f, 2)
         # Pie
         pie_f = QFrame(objectName="Card")
         pl = QVBoxLayout(pie_f)
         pl.addWidget(QLabel("Type Distribution"))
-        self.cv_pie = MplCanvas(self)
+        self.cv_pie = PieChart(self)
         pl.addWidget(self.cv_pie)
         chart_row.addWidget(pie_f, 1)
         d_layout.addLayout(chart_row)
@@ -271,11 +945,21 @@ class DashboardWindow(QMainWindow):
         # Table
         tbl_f = QFrame(objectName="Card")
         tl = QVBoxLayout(tbl_f)
-        tl.addWidget(QLabel("Live Data Grid"))
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Name", "Type", "Pressure", "Temp", "Status"])
+        grid_header = QHBoxLayout()
+        grid_header.addWidget(QLabel("Live Data Grid"))
+        grid_header.addStretch()
+        self.status_combo = QComboBox()
+        self.status_combo.addItems(["All statuses", "CRITICAL", "WARNING", "OK", "UNKNOWN"])
+        self.status_combo.currentIndexChanged.connect(self.filter_grid)
+        grid_header.addWidget(self.status_combo)
+        tl.addLayout(grid_header)
+        self.grid_model = DatasetTableModel(fetch_page=self.fetch_grid_page, parent=self)
+        self.table = QTableView()
+        self.table.setModel(self.grid_model)
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(24)
         tl.addWidget(self.table)
         d_layout.addWidget(tbl_f)
         
@@ -293,200 +977,340 @@ class DashboardWindow(QMainWindow):
         l.addWidget(QLabel(val, objectName="CardValue"))
         return f
 
+    def cached_get(self, path, on_done, on_error, accept=None):
+        """Async GET with If-None-Match; a 304 reuses the payload we already decoded.
+
+        ``on_done(status, payload)`` runs on the GUI thread.
+        """
+        headers = {}
+        if accept:
+            headers['Accept'] = accept
+        cached = self.http_cache.get(path)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+
+        def handle(result):
+            status, etag, payload = result
+            if status == 304 and cached:
+                on_done(200, cached[1])
+                return
+            if status == 200 and etag:
+                self.http_cache[path] = (etag, payload)
+            on_done(status, payload)
+
+        return api.get(path, handle, on_error=on_error, headers=headers, decode=decode_with_status)
+
     def refresh_history(self):
         # Fetch history specific to logged-in user
-        headers = {'Authorization': f'Token {self.token}'}
-        
-        # Clear existing buttons
+        self.cached_get("upload/", self.show_history, self.history_error)
+
+    def clear_history(self):
         while self.hist_layout.count():
             item = self.hist_layout.takeAt(0)
             if item.widget():
                 item.widget().deleteLater()
 
-        try:
-            res = requests.get(f"{API_BASE}/upload/", headers=headers)
-            if res.status_code == 200:
-                history = res.json().get('history', [])
-                if history:
-                    for h in history:
-                        raw_date = h.get('uploaded_at', '').split('T')[0]
-                        btn_text = f"{h.get('file_name')}\n{raw_date}"
-                        
-                        btn = QPushButton(btn_text)
-                        btn.setObjectName("HistoryBtn")
-                        # Use lambda to capture the ID
-                        btn.clicked.connect(lambda checked, pk=h['id']: self.load_history_item(pk))
-                        self.hist_layout.addWidget(btn)
-                else:
-                    self.hist_layout.addWidget(QLabel("No uploads yet."))
+    def show_history(self, status, data):
+        self.clear_history()
+        if status == 200:
+            history = data.get('history', [])
+            if history:
+                for h in history:
+                    raw_date = h.get('uploaded_at', '').split('T')[0]
+                    btn_text = f"{h.get('file_name')}\n{raw_date}"
+                    
+                    btn = QPushButton(btn_text)
+                    btn.setObjectName("HistoryBtn")
+                    # Use lambda to capture the ID
+                    btn.clicked.connect(lambda checked, pk=h['id']: self.load_history_item(pk))
+                    self.hist_layout.addWidget(btn)
             else:
-                self.hist_layout.addWidget(QLabel("Failed to load history."))
-        except Exception as e:
-            self.hist_layout.addWidget(QLabel(f"Connection error: {e}"))
+                self.hist_layout.addWidget(QLabel("No uploads yet."))
+        else:
+            self.hist_layout.addWidget(QLabel("Failed to load history."))
+
+    def history_error(self, message):
+        self.clear_history()
+        self.hist_layout.addWidget(QLabel(f"Connection error: {message}"))
 
     def load_history_item(self, pk):
-        headers = {'Authorization': f'Token {self.token}'}
-        try:
-            res = requests.get(f"{API_BASE}/history/{pk}/", headers=headers)
-            if res.status_code == 200:
-                data = res.json()
-                self.current_data = data.get('data', [])
-                self.update_ui(data)
-                self.btn_pdf.setEnabled(True)
+        # A newer click supersedes a load still in flight
+        if self.pending_load:
+            self.pending_load.cancel()
+
+        # Show the local copy right away, then check it with the server
+        entry = self.dataset_cache.get(pk)
+        headers = {'Accept': DATASET_ACCEPT}
+        if entry:
+            self.show_history_item(200, entry[1])
+            if entry[0]:
+                headers['If-None-Match'] = entry[0]
+
+        def handle(result):
+            self.pending_load = None
+            status, etag, payload = result
+            if status == 304:
+                return
+            if status == 200:
+                self.dataset_cache.put(pk, etag, payload)
+                self.show_history_item(status, payload)
+                return
+            if status == 404:
+                self.dataset_cache.discard(pk)
+            if entry:
+                QMessageBox.warning(self, "Error", "This dataset is no longer available on the server")
             else:
-                QMessageBox.warning(self, "Error", "Could not load history item")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+                self.show_history_item(status, payload)
+
+        def on_error(message):
+            # Offline: a cached copy is as good as a fresh one
+            self.pending_load = None
+            if not entry:
+                self.request_error(message)
+
+        self.pending_load = api.get(f"history/{pk}/?limit={GRID_PAGE_ROWS}", handle, on_error=on_error,
+                                    headers=headers, decode=decode_with_status)
+
+    def show_history_item(self, status, data):
+        self.pending_load = None
+        if status == 200:
+            self.current_id = data.get('history_id')
+            self.current_data = dataset_frame(data)
+            self.update_ui(data)
+            self.btn_pdf.setEnabled(True)
+        else:
+            QMessageBox.warning(self, "Error", "Could not load history item")
+
+    def request_error(self, message):
+        self.pending_load = None
+        QMessageBox.critical(self, "Error", message)
 
     def upload_file(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Open CSV", "", "CSV Files (*.csv)")
-        if not path: return
-        
-        headers = {'Authorization': f'Token {self.token}'}
-        try:
-            with open(path, 'rb') as f:
-                res = requests.post(f"{API_BASE}/upload/", files={'file': f}, headers=headers)
-            
-            if res.status_code == 200:
-                data = res.json()
-                self.current_data = data.get('data', [])
+        paths, _ = QFileDialog.getOpenFileNames(self, "Open CSV", "",
+                                                "Equipment Data (*.csv *.zip);;CSV Files (*.csv);;ZIP Archives (*.zip)")
+        if not paths: return
+        if len(paths) > 1 or paths[0].lower().endswith('.zip'):
+            return self.upload_batch(paths)
+        path = paths[0]
+
+        progress = QProgressDialog("Uploading...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+
+        def on_progress(sent, total):
+            progress.setValue(int(sent * 100 / total) if total else 0)
+            if sent >= total:
+                progress.setLabelText("Analyzing on server...")
+
+        def forget():
+            if task in self.tasks_in_flight:
+                self.tasks_in_flight.remove(task)
+
+        def on_cancel():
+            task.cancel()
+            forget()
+
+        def on_done(result):
+            forget()
+            progress.close()
+            status, _, data = result
+            if status == 200:
+                self.dataset_cache.put(data.get('history_id'), None, data)
+                self.current_id = data.get('history_id')
+                self.current_data = dataset_frame(data)
                 self.update_ui(data)
                 self.btn_pdf.setEnabled(True)
                 self.refresh_history() # Refresh list after upload
             else:
-                QMessageBox.warning(self, "Error", f"Upload failed: {res.status_code}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+                QMessageBox.warning(self, "Error", f"Upload failed: {status}")
+
+        def on_error(message):
+            forget()
+            progress.close()
+            QMessageBox.critical(self, "Error", message)
+
+        task = api.post(f"upload/?limit={GRID_PAGE_ROWS}", on_done, on_error=on_error, on_progress=on_progress,
+                        upload_path=path, headers={'Accept': DATASET_ACCEPT}, decode=decode_with_status)
+        progress.canceled.connect(on_cancel)
+        self.tasks_in_flight.append(task)
+
+    def upload_batch(self, paths):
+        """Send several CSVs (or ZIP archives of them) in one request, then open the newest."""
+        progress = QProgressDialog(f"Uploading {len(paths)} files...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+
+        def on_progress(sent, total):
+            progress.setValue(int(sent * 100 / total) if total else 0)
+            if sent >= total:
+                progress.setLabelText("Analyzing on server...")
+
+        def forget():
+            if task in self.tasks_in_flight:
+                self.tasks_in_flight.remove(task)
+
+        def on_cancel():
+            task.cancel()
+            forget()
+
+        def on_done(res):
+            forget()
+            progress.close()
+            try:
+                payload = res.json()
+            except ValueError:
+                payload = {}
+            files = payload.get('files', [])
+            failed = [f"{f['file']}: {f['error']}" for f in files if 'error' in f]
+            done = [f for f in files if 'history_id' in f]
+            if done:
+                self.refresh_history()
+                self.load_history_item(done[-1]['history_id'])
+            warning = payload.get('warning') # more datasets than the server keeps
+            if failed or not done or warning:
+                if not done and not failed:
+                    failed = [payload.get('error') or f"Upload failed: {res.status_code}"]
+                message = "\n\n".join(part for part in ("\n".join(failed), warning) if part)
+                QMessageBox.warning(self, "Batch Upload",
+                                    f"{len(done)} of {len(files)} files analyzed.\n\n{message}")
+
+        def on_error(message):
+            forget()
+            progress.close()
+            QMessageBox.critical(self, "Error", message)
+
+        task = api.post("upload/batch/", on_done, on_error=on_error, on_progress=on_progress,
+                        upload_path=paths, upload_field='files')
+        progress.canceled.connect(on_cancel)
+        self.tasks_in_flight.append(task)
+
+    def fetch_grid_page(self, offset, limit, sort):
+        """Called by the grid model when the user scrolls past the loaded rows."""
+        if self.current_id is None:
+            self.grid_model.fetch_failed()
+            return
+        params = {'offset': offset, 'limit': limit}
+        if sort:
+            params['sort'] = sort
+        generation = self.grid_model.generation
+
+        def on_done(result):
+            if generation != self.grid_model.generation:
+                return
+            status, _, payload = result
+            if status == 200:
+                self.grid_model.append(dataset_frame(payload))
+            else:
+                self.grid_model.fetch_failed()
+
+        def on_error(message):
+            if generation == self.grid_model.generation:
+                self.grid_model.fetch_failed()
+
+        api.get(f"history/{self.current_id}/?{urlencode(params)}", on_done, on_error=on_error,
+                headers={'Accept': DATASET_ACCEPT}, decode=decode_with_status)
+
+    def filter_grid(self, index):
+        self.grid_model.set_status_filter(None if index == 0 else self.status_combo.currentText())
 
     def update_ui(self, data):
         stats = data.get('stats', {})
-        records = data.get('data', [])
+        self.current_stats = stats
+        grid = grid_frame(self.current_data)
         
         # KPIs
         self.kpi_total.findChild(QLabel, "CardValue").setText(str(stats.get('total_count', 0)))
         self.kpi_press.findChild(QLabel, "CardValue").setText(f"{stats.get('avg_pressure', 0)}")
         self.kpi_temp.findChild(QLabel, "CardValue").setText(f"{stats.get('avg_temp', 0)}")
         
-        # Table
-        self.table.setRowCount(len(records))
-        for i, row in enumerate(records):
-            self.table.setItem(i, 0, QTableWidgetItem(str(row.get('Equipment Name', row.get('name')))))
-            self.table.setItem(i, 1, QTableWidgetItem(str(row.get('Type', row.get('type')))))
-            self.table.setItem(i, 2, QTableWidgetItem(str(row.get('Pressure', row.get('pressure')))))
-            self.table.setItem(i, 3, QTableWidgetItem(str(row.get('Temperature', row.get('temp')))))
-            
-            status = row.get('Status', 'UNKNOWN')
-            item = QTableWidgetItem(status)
-            item.setTextAlignment(Qt.AlignCenter)
-            if status == 'CRITICAL':
-                item.setBackground(QColor("#fadbd8"))
-                item.setForeground(QColor("#c0392b"))
-            elif status == 'WARNING':
-                item.setBackground(QColor("#fdebd0"))
-                item.setForeground(QColor("#d35400"))
-            else:
-                item.setBackground(QColor("#d4efdf"))
-                item.setForeground(QColor("#27ae60"))
-            self.table.setItem(i, 4, item)
+        # Table: first page now, the rest on demand as the user scrolls
+        self.grid_model.reset(self.current_data, total=data.get('page', {}).get('total'))
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
             
-        # Charts
-        df = pd.DataFrame(records)
-        self.cv_bar.axes.cla()
-        if not df.empty:
-            names = [r.get('Equipment Name', r.get('name')) for r in records]
-            p = [r.get('Pressure', r.get('pressure', 0)) for r in records]
-            t = [r.get('Temperature', r.get('temp', 0)) for r in records]
-            x = range(len(names))
-            w = 0.35
-            self.cv_bar.axes.bar([i-w/2 for i in x], p, w, label='Press', color='#36A2EB')
-            self.cv_bar.axes.bar([i+w/2 for i in x], t, w, label='Temp', color='#FF6384')
-            self.cv_bar.axes.set_xticks(x)
-            self.cv_bar.axes.set_xticklabels(names, rotation=45, ha='right')
-            self.cv_bar.axes.legend()
-        self.cv_bar.draw()
-        
-        self.cv_pie.axes.cla()
-        dist = stats.get('type_distribution', {})
-        if dist:
-            self.cv_pie.axes.pie(dist.values(), labels=dist.keys(), autopct='%1.1f%%')
-        self.cv_pie.draw()
+        # Charts: at most CHART_MAX_BARS bar pairs, whatever the row count
+        self.cv_bar.plot(*chart_series(grid))
+        total = data.get('page', {}).get('total') or len(grid)
+        self.cv_bar.axes.set_title(
+            f"Averages over {len(grid):,} of {total:,} rows" if len(grid) > CHART_MAX_BARS else '',
+            fontsize=9)
+        self.cv_pie.plot(stats.get('type_distribution', {}))
 
     def generate_pdf(self):
-        if not self.current_data:
+        if not self.grid_model.loaded or self.report_task:
             return
-            
+
+        loaded = self.grid_model.loaded
+        total = self.grid_model.total
+        summary_only = False
+        if total > PDF_SUMMARY_ROWS:
+            choice = QMessageBox.question(
+                self, "Large Dataset",
+                f"This dataset has {total:,} rows. Include the data table?\n"
+                "Choose No for a summary-only report.",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.No)
+            if choice == QMessageBox.Cancel:
+                return
+            summary_only = choice == QMessageBox.No
+
         save_path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "equipment_report.pdf", "PDF Files (*.pdf)")
         if not save_path: return
-        
-        try:
-            doc = SimpleDocTemplate(save_path, pagesize=letter)
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # Title
-            elements.append(Paragraph("Chemical Equipment Report", styles['Title']))
-            elements.append(Spacer(1, 12))
-            elements.append(Paragraph(f"Generated by: {self.username} on {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
-            elements.append(Spacer(1, 20))
-            
-            # --- 1. Save Charts as Images ---
-            # Create temp files to store chart images
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_bar:
-                self.cv_bar.figure.savefig(tmp_bar.name, bbox_inches='tight')
-                bar_img_path = tmp_bar.name
-                
-            with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_pie:
-                self.cv_pie.figure.savefig(tmp_pie.name, bbox_inches='tight')
-                pie_img_path = tmp_pie.name
-
-            # Add Images to PDF (Side by side using a Table)
-            # Create Image objects from reportlab
-            img_bar = Image(bar_img_path, width=250, height=200)
-            img_pie = Image(pie_img_path, width=250, height=200)
-            
-            # Put images in a table to align them
-            chart_table = Table([[img_bar, img_pie]])
-            elements.append(chart_table)
-            elements.append(Spacer(1, 20))
-
-            # --- 2. Data Table ---
-            data = [["Name", "Type", "Pressure", "Temp", "Status"]]
-            for row in self.current_data:
-                data.append([
-                    str(row.get('Equipment Name', row.get('name'))),
-                    str(row.get('Type', row.get('type'))),
-                    str(row.get('Pressure', row.get('pressure'))),
-                    str(row.get('Temperature', row.get('temp'))),
-                    str(row.get('Status', 'UNKNOWN'))
-                ])
-                
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
-            
-            elements.append(table)
-            doc.build(elements)
-            
-            # Cleanup temp files
-            try:
-                os.remove(bar_img_path)
-                os.remove(pie_img_path)
-            except:
-                pass
-                
-            QMessageBox.information(self, "Success", f"PDF saved to {save_path}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"PDF Generation failed: {str(e)}")
+
+        # Figures belong to the GUI thread, so render them here; the rest runs on the pool
+        task = ReportTask(save_path, self.username, self.current_stats,
+                          [chart_png(self.cv_bar), chart_png(self.cv_pie)],
+                          frame=None if summary_only else self.grid_model.loaded_frame(),
+                          total_rows=max(total, loaded))
+        task.setAutoDelete(False)
+
+        progress = QProgressDialog("Generating PDF...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+
+        def finish():
+            self.report_task = None
+            self.btn_pdf.setEnabled(True)
+            progress.close()
+
+        def on_progress(done, size):
+            progress.setValue(int(done * 100 / size) if size else 0)
+
+        def on_done(path):
+            finish()
+            QMessageBox.information(self, "Success", f"PDF saved to {path}")
+
+        def on_error(message):
+            finish()
+            QMessageBox.critical(self, "Error", f"PDF Generation failed: {message}")
+
+        def on_cancel():
+            task.cancel()
+            self.report_task = None
+            self.btn_pdf.setEnabled(True)
+
+        task.signals.progress.connect(on_progress)
+        task.signals.finished.connect(on_done)
+        task.signals.failed.connect(on_error)
+        progress.canceled.connect(on_cancel)
+        self.report_task = task
+        self.btn_pdf.setEnabled(False)
+        api.pool.start(task)
 
     def logout(self):
+        if self.pending_load:
+            self.pending_load.cancel()
+        for task in self.tasks_in_flight:
+            task.cancel()
+        if self.report_task:
+            self.report_task.cancel()
+        # Revoke the token server-side. It is shared by every client of this
+        # user, so the web app is signed out too. Pass it explicitly:
+        # set_token(None) below clears the session header before the worker
+        # sends this.
+        api.post("logout/", lambda res: None, headers={'Authorization': f'Token {self.token}'})
+        api.set_token(None)
         self.close()
         self.login = LoginWindow()
         self.login.success_signal.connect(start_dashboard)
@@ -494,6 +1318,7 @@ class DashboardWindow(QMainWindow):
 
 def start_dashboard(token, username):
     global window
+    api.set_token(token)
     window = DashboardWindow(token, username)
     window.showMaximized()
     login.close()
@@ -501,6 +1326,7 @@ def start_dashboard(token, username):
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
+    api = ApiClient()
     login = LoginWindow()
     login.success_signal.connect(start_dashboard)
     login.show()